@@ -30,6 +30,144 @@ CREATE TABLE usage_logs (
     INDEX idx_endpoint (endpoint)
 );
 
+-- Reddit Watches
+-- One row per unique (query, subreddit), shared by all subscribers
+CREATE TABLE reddit_watches (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    query TEXT NOT NULL,
+    subreddit TEXT NOT NULL,                 -- "all" for site-wide
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    last_polled_at DATETIME,                 -- Also used to claim a poll across workers
+    newest_created_utc REAL,                 -- Watermark of newest post seen
+    
+    UNIQUE (query, subreddit),
+    INDEX idx_last_polled_at (last_polled_at)
+);
+
+CREATE TABLE reddit_watch_subscriptions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    watch_id INTEGER NOT NULL,               -- References reddit_watches.id
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    
+    UNIQUE (user_id, watch_id),
+    INDEX idx_user_id (user_id),
+    INDEX idx_watch_id (watch_id)
+);
+
+-- New posts found per watch; id is the cursor clients poll with
+CREATE TABLE reddit_watch_matches (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    watch_id INTEGER NOT NULL,
+    submission_id TEXT NOT NULL,
+    title TEXT NOT NULL,
+    subreddit TEXT NOT NULL,
+    author TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    created_utc REAL NOT NULL,
+    num_comments INTEGER NOT NULL,
+    selftext TEXT NOT NULL,
+    found_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    
+    UNIQUE (watch_id, submission_id),
+    INDEX idx_watch_id (watch_id),
+    INDEX idx_found_at (found_at)
+);
+
+-- Email Jobs
+-- Durable queue for async_delivery sends
+CREATE TABLE email_jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT UNIQUE NOT NULL,             -- Public id (format: job_xxxxx)
+    user_id TEXT NOT NULL,
+    to_email TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    body TEXT NOT NULL,                      -- Rendered HTML
+    callback_url TEXT,
+    status TEXT DEFAULT 'queued',            -- queued, sending, sent, failed
+    attempts INTEGER DEFAULT 0,
+    next_attempt_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    message_id TEXT,                         -- SendGrid X-Message-Id once sent
+    last_error TEXT,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    
+    INDEX idx_user_id (user_id),
+    INDEX idx_status (status),
+    INDEX idx_next_attempt_at (next_attempt_at)
+);
+
+-- Email Templates
+-- {{ variable }} placeholders are filled in per send
+CREATE TABLE email_templates (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    body TEXT NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    
+    UNIQUE (user_id, name),
+    INDEX idx_user_id (user_id)
+);
+
+-- Sent emails table
+-- Maps provider message IDs to the sender, so only they can read its events
+CREATE TABLE sent_emails (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    message_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    
+    INDEX idx_message_id (message_id)
+);
+
+-- Email events table
+-- Written in batches from the SendGrid event webhook
+CREATE TABLE email_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    message_id TEXT NOT NULL,
+    sg_event_id TEXT,
+    event TEXT NOT NULL,
+    email TEXT,
+    timestamp DATETIME NOT NULL,
+    reason TEXT,
+    url TEXT,
+    received_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    
+    INDEX idx_message_time (message_id, timestamp)
+);
+
+-- OAuth states table
+-- Pending OAuth flows; shared by all workers, swept once expired
+CREATE TABLE oauth_states (
+    state TEXT PRIMARY KEY,
+    provider TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    expires_at DATETIME NOT NULL,
+    
+    INDEX idx_user_id (user_id),
+    INDEX idx_expires_at (expires_at)
+);
+
+-- Credentials table
+-- Third-party user credentials, encrypted at rest (Fernet)
+CREATE TABLE credentials (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    secret TEXT,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    
+    UNIQUE (user_id, provider),
+    INDEX idx_user_id (user_id),
+    INDEX idx_updated_at (updated_at)
+);
+
 -- Example Queries
 -- ===============
 
@@ -0,0 +1,160 @@
+"""
+Small in-process caches shared by the routers.
+"""
+import os
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Hashable, Optional
+
+
+class TTLCache:
+    """
+    Size-bounded LRU cache with optional per-entry expiry
+
+    Entries older than `ttl` seconds are treated as missing. Pass
+    ttl=None for a plain LRU. Safe to use from worker threads.
+    """
+
+    def __init__(self, ttl: Optional[float] = None, maxsize: int = 1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires_at, value = item
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.pop(key, None)
+        return default if item is None else item[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class BlobCache:
+    """
+    Content-addressed byte cache: an in-memory LRU in front of a disk LRU
+
+    Keys must name immutable content (e.g. git blob SHAs), so entries never
+    need invalidation. Both tiers are bounded by total bytes; the disk tier
+    survives restarts and is indexed lazily on first use.
+    """
+
+    def __init__(self, directory: str, memory_bytes: int, disk_bytes: int):
+        self.directory = directory
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._disk = None  # key -> size, least recently used first
+        self._disk_size = 0
+        self._lock = Lock()
+
+    def _path(self, key: str) -> str:
+        if not key.isalnum():
+            raise ValueError(f"Invalid cache key: {key!r}")
+        return os.path.join(self.directory, key)
+
+    def _load_disk_index(self):
+        os.makedirs(self.directory, exist_ok=True)
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.isalnum():
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name, stat.st_size))
+        self._disk = OrderedDict((name, size) for _, name, size in sorted(entries))
+        self._disk_size = sum(self._disk.values())
+
+    def _remember(self, key: str, data: bytes):
+        """Add to the memory tier (lock held)"""
+        if len(data) > self.memory_bytes:
+            return
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return
+        self._memory[key] = data
+        self._memory_size += len(data)
+        while self._memory_size > self.memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                return data
+            if self._disk is None:
+                self._load_disk_index()
+            if key not in self._disk:
+                return None
+            self._disk.move_to_end(key)
+
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)  # Keep LRU order across restarts
+        except FileNotFoundError:
+            with self._lock:
+                self._disk_size -= self._disk.pop(key, 0)
+            return None
+
+        with self._lock:
+            self._remember(key, data)
+        return data
+
+    def put(self, key: str, data: bytes):
+        path = self._path(key)
+        with self._lock:
+            self._remember(key, data)
+            if self._disk is None:
+                self._load_disk_index()
+            if key in self._disk or len(data) > self.disk_bytes:
+                return
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        evicted = []
+        with self._lock:
+            if key not in self._disk:
+                self._disk[key] = len(data)
+                self._disk_size += len(data)
+            while self._disk_size > self.disk_bytes:
+                old_key, size = self._disk.popitem(last=False)
+                self._disk_size -= size
+                evicted.append(old_key)
+
+        for old_key in evicted:
+            try:
+                os.remove(self._path(old_key))
+            except FileNotFoundError:
+                pass
@@ -14,10 +14,59 @@ class Settings(BaseSettings):
     reddit_user_agent: str = "AgentAPIProxy/1.0"
     reddit_username: str = ""
     reddit_password: str = ""
+    reddit_batch_concurrency: int = 5  # Parallel searches per batch request
+    reddit_listing_cache_ttl: int = 30  # Seconds to cache a listing page
+    reddit_more_concurrency: int = 4  # Parallel "load more" comment expansions
+    reddit_watch_interval: int = 60  # Seconds between polls of each watch
+    reddit_watch_fetch_limit: int = 25  # Newest posts fetched per poll
+    reddit_watch_index_grace_seconds: int = 900  # How late search may index a post and still match
+    reddit_watch_retention_hours: int = 72  # How long matches are kept
+    reddit_watch_max_per_user: int = 20
     
     # SendGrid
     sendgrid_api_key: str = ""
     sendgrid_from_email: str = ""
+    sendgrid_max_connections: int = 20  # Pooled connections to the SendGrid API
+    sendgrid_webhook_public_key: str = ""  # Event webhook verification key (Mail Settings)
+    
+    # Email delivery queue (async_delivery sends)
+    email_worker_count: int = 2
+    email_max_attempts: int = 6
+    email_retry_base_seconds: int = 10  # Doubles after each failed attempt
+    email_retry_max_seconds: int = 900
+    email_queue_poll_seconds: int = 5
+    email_send_lease_seconds: int = 300  # Requeue jobs stuck in "sending" after this
+    email_lease_sweep_seconds: int = 30  # How often each process looks for expired leases
+    
+    # Email event webhook ingestion
+    email_event_batch_size: int = 500  # Events written per insert
+    email_event_flush_seconds: float = 1.0  # Max time an event waits before being written
+    email_event_queue_max: int = 1000  # Webhook posts buffered before returning 503
+    email_event_retry_base_seconds: float = 1.0  # First retry delay after a failed write; doubles
+    email_event_retry_max_seconds: float = 60.0
+    
+    # Email templates
+    email_template_cache_size: int = 256  # Compiled templates kept in memory
+    email_template_max_per_user: int = 100
+    
+    # Email attachments (SendGrid caps a whole message at 30MB)
+    email_attachment_max_bytes: int = 10 * 1024 * 1024
+    email_attachments_max_total_bytes: int = 20 * 1024 * 1024
+    email_attachments_max_count: int = 10
+    
+    # SMTP relay (fallback email backend when SendGrid is unhealthy)
+    smtp_host: str = ""
+    smtp_port: int = 587
+    smtp_username: str = ""
+    smtp_password: str = ""
+    smtp_use_tls: bool = True  # STARTTLS after connecting
+    smtp_from_email: str = ""  # Defaults to sendgrid_from_email
+    
+    # Email backend health routing
+    email_backend_timeout: float = 15.0  # Seconds before an attempt counts as failed
+    email_backend_slow_seconds: float = 5.0  # Average latency that marks a backend unhealthy
+    email_backend_error_threshold: float = 0.5  # Average error rate that marks a backend unhealthy
+    email_backend_cooldown_seconds: int = 30  # How long an unhealthy backend is skipped
     
     # Facebook Messenger
     facebook_page_token: str = ""
@@ -30,25 +79,75 @@ class Settings(BaseSettings):
     twitter_consumer_secret: str = ""
     twitter_access_token: str = ""
     twitter_access_token_secret: str = ""
+    twitter_max_workers: int = 4  # Threads dedicated to Twitter calls
+    twitter_max_pending: int = 32  # Calls allowed in flight or queued
+    twitter_read_cache_ttl: int = 60  # Seconds to cache search/timeline results
+    twitter_media_max_bytes: int = 512 * 1024 * 1024  # Twitter's video limit
+    twitter_media_segment_bytes: int = 1024 * 1024  # APPEND segment size (max 5MB)
+    twitter_media_parallel_segments: int = 3  # APPEND calls in flight per upload
+    twitter_media_processing_timeout: int = 120  # Seconds to wait for video processing
+    
+    # Discord webhooks
+    discord_max_connections: int = 20  # Pooled connections to Discord
+    discord_max_wait_seconds: float = 10.0  # Longest a send waits on a rate limit before returning 429
+    discord_max_queued_per_webhook: int = 50  # Sends waiting on one webhook before returning 429
+    discord_webhook_state_size: int = 4096  # Webhooks whose rate-limit state is tracked
+    discord_fanout_concurrency: int = 10  # Webhooks posted to in parallel per fan-out
+    discord_fanout_max_targets: int = 100
+    discord_coalesce_window_seconds: float = 0.5  # How long coalesced messages wait for company
     
     # GitHub OAuth
     github_client_id: str = ""
     github_client_secret: str = ""
     github_callback_url: str = "https://agent-api-proxy-production.up.railway.app/api/github/callback"
+    oauth_state_ttl_seconds: int = 600  # Time allowed to finish an OAuth flow
+    oauth_state_max_per_user: int = 5  # Pending flows kept per user; oldest dropped first
+    oauth_state_sweep_seconds: int = 60  # Minimum time between expired-state sweeps
+    github_max_connections: int = 20  # Pooled connections to the GitHub API
+    github_blob_concurrency: int = 8  # Blobs created in parallel per push
+    github_inline_blob_bytes: int = 64 * 1024  # Smaller text files go inline in the tree
+    github_push_max_files: int = 500
+    github_sha_cache_size: int = 4096  # Known file SHAs kept for push-file
+    github_sha_fresh_seconds: int = 60  # Trust a known SHA without asking GitHub for this long
+    github_blob_cache_dir: str = ".cache/github-blobs"
+    github_blob_cache_memory_bytes: int = 64 * 1024 * 1024
+    github_blob_cache_disk_bytes: int = 1024 * 1024 * 1024
+    github_tree_content_max_files: int = 200  # Files whose content a tree read may include
+    github_contents_max_bytes: int = 1024 * 1024  # Larger raw uploads go through the blob API
+    github_raw_upload_max_bytes: int = 100 * 1024 * 1024  # GitHub's per-file limit
+    github_bootstrap_ready_timeout: int = 30  # Seconds to wait for a new repo to initialize
+    github_rate_limit_reserve: int = 100  # Pace calls once a token has this few left
+    github_rate_limit_max_wait: int = 30  # Longest we'll hold a call for quota before returning 429
+    github_rate_limit_max_interval: float = 2.0  # Widest spacing between paced calls
+    github_token_quota_size: int = 4096  # Tokens whose quota is tracked
     
     # Frontend URL (for OAuth redirects)
     frontend_url: str = "https://agent-api-proxy-production.up.railway.app"
     
+    # Credential vault (user tokens for GitHub, Vercel, Twilio)
+    credential_encryption_key: str = ""  # Fernet key: python -c "from cryptography.fernet import Fernet; print(Fernet.generate_key().decode())"
+    credential_cache_size: int = 1024  # Decrypted credentials kept per process
+    credential_cache_sync_seconds: int = 5  # How often a worker checks for credentials changed elsewhere
+    
     # Rate Limiting (requests per minute per API key)
     rate_limit_per_minute: int = 30
     
     # Pricing (in cents)
     cost_reddit_post: int = 10
     cost_reddit_search: int = 5
+    cost_reddit_listing: int = 2
+    cost_reddit_comments: int = 5
+    cost_reddit_watch_create: int = 5
+    cost_reddit_watch_poll: int = 1
     cost_email_send: int = 15
     cost_twitter_tweet: int = 10
+    cost_twitter_read: int = 2
+    cost_twitter_media: int = 5
     cost_github_create_repo: int = 10
     cost_github_push_file: int = 5
+    cost_github_push_files: int = 10
+    cost_github_read: int = 2
+    cost_github_bootstrap: int = 15
     cost_discord_webhook: int = 5
     cost_vercel_deploy: int = 25
     cost_vercel_list: int = 5
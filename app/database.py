@@ -1,8 +1,10 @@
-from sqlalchemy import create_engine, Column, String, Integer, DateTime, Float
+from sqlalchemy import create_engine, Column, String, Integer, DateTime, Float, Index, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from datetime import datetime
+from datetime import datetime, timedelta
+from typing import Optional
 import secrets
+import time
 
 from app.config import get_settings
 
@@ -45,6 +47,133 @@ class UsageLog(Base):
     error_message = Column(String, nullable=True)
 
 
+class RedditWatch(Base):
+    """A (query, subreddit) pair polled on behalf of all its subscribers"""
+    __tablename__ = "reddit_watches"
+    __table_args__ = (UniqueConstraint("query", "subreddit"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    query = Column(String, nullable=False)
+    subreddit = Column(String, nullable=False)  # "all" for site-wide
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_polled_at = Column(DateTime, nullable=True, index=True)
+    newest_created_utc = Column(Float, nullable=True)  # Watermark of newest post seen
+
+
+class RedditWatchSubscription(Base):
+    """A user's subscription to a shared watch"""
+    __tablename__ = "reddit_watch_subscriptions"
+    __table_args__ = (UniqueConstraint("user_id", "watch_id"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(String, index=True, nullable=False)
+    watch_id = Column(Integer, index=True, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class RedditWatchMatch(Base):
+    """A new post found for a watch; id doubles as the delivery cursor"""
+    __tablename__ = "reddit_watch_matches"
+    __table_args__ = (UniqueConstraint("watch_id", "submission_id"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    watch_id = Column(Integer, index=True, nullable=False)
+    submission_id = Column(String, nullable=False)
+    title = Column(String, nullable=False)
+    subreddit = Column(String, nullable=False)
+    author = Column(String, nullable=False)
+    score = Column(Integer, nullable=False)
+    url = Column(String, nullable=False)
+    created_utc = Column(Float, nullable=False)
+    num_comments = Column(Integer, nullable=False)
+    selftext = Column(String, nullable=False)
+    found_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class EmailJob(Base):
+    """Outbound email queued for background delivery"""
+    __tablename__ = "email_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(String, unique=True, index=True, nullable=False)
+    user_id = Column(String, index=True, nullable=False)
+    to_email = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    body = Column(String, nullable=False)  # Rendered HTML
+    callback_url = Column(String, nullable=True)
+    status = Column(String, default="queued", index=True)  # queued, sending, sent, failed
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, index=True)
+    message_id = Column(String, nullable=True)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class EmailTemplate(Base):
+    """Stored email template; {{ variables }} are filled in per send"""
+    __tablename__ = "email_templates"
+    __table_args__ = (UniqueConstraint("user_id", "name"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(String, index=True, nullable=False)
+    name = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    body = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class SentEmail(Base):
+    """Which user sent a provider message ID (scopes /api/email/status)"""
+    __tablename__ = "sent_emails"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    message_id = Column(String, index=True, nullable=False)
+    user_id = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class EmailEvent(Base):
+    """Delivery/engagement event reported by the SendGrid event webhook"""
+    __tablename__ = "email_events"
+    __table_args__ = (Index("ix_email_events_message_time", "message_id", "timestamp"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    message_id = Column(String, nullable=False)  # X-Message-Id returned on send
+    sg_event_id = Column(String, nullable=True)
+    event = Column(String, nullable=False)  # processed, delivered, bounce, open, click, ...
+    email = Column(String, nullable=True)
+    timestamp = Column(DateTime, nullable=False)
+    reason = Column(String, nullable=True)  # Bounce/drop reason or SMTP response
+    url = Column(String, nullable=True)  # Clicked link
+    received_at = Column(DateTime, default=datetime.utcnow)
+
+
+class OAuthState(Base):
+    """Pending OAuth authorization, consumed by the provider's callback"""
+    __tablename__ = "oauth_states"
+    
+    state = Column(String, primary_key=True)
+    provider = Column(String, nullable=False)  # github, ...
+    user_id = Column(String, index=True, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, index=True, nullable=False)
+
+
+class Credential(Base):
+    """Third-party credential for a user, Fernet-encrypted (see app/vault.py)"""
+    __tablename__ = "credentials"
+    __table_args__ = (UniqueConstraint("user_id", "provider"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(String, index=True, nullable=False)
+    provider = Column(String, nullable=False)  # github, vercel, twilio
+    secret = Column(String, nullable=True)  # Encrypted JSON; NULL once deleted
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
 def init_db():
     """Initialize database tables"""
     Base.metadata.create_all(bind=engine)
@@ -85,3 +214,94 @@ def log_usage(db, user_id: str, endpoint: str, cost: int, success: bool = True,
     )
     db.add(log_entry)
     db.commit()
+
+
+def log_usage_batch(db, entries: list):
+    """
+    Log several API usage entries with a single commit
+    
+    Each entry is a dict of log_usage keyword arguments
+    (user_id, endpoint, cost, success, error_message).
+    """
+    db.add_all([
+        UsageLog(
+            user_id=entry["user_id"],
+            endpoint=entry["endpoint"],
+            cost=entry["cost"],
+            success=1 if entry.get("success", True) else 0,
+            error_message=entry.get("error_message")
+        )
+        for entry in entries
+    ])
+    db.commit()
+
+
+_last_oauth_sweep = 0.0
+
+
+def sweep_oauth_states(db) -> int:
+    """Delete expired OAuth states (an index range scan over expired rows only)"""
+    deleted = db.query(OAuthState).filter(
+        OAuthState.expires_at <= datetime.utcnow()
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+
+def create_oauth_state(db, provider: str, user_id: str) -> str:
+    """
+    Start an OAuth flow and return its state token
+    
+    States live in the database so any worker can complete the callback.
+    They expire after oauth_state_ttl_seconds, and a user keeps at most
+    oauth_state_max_per_user pending flows (the oldest are dropped).
+    """
+    global _last_oauth_sweep
+    if time.monotonic() - _last_oauth_sweep >= settings.oauth_state_sweep_seconds:
+        _last_oauth_sweep = time.monotonic()
+        sweep_oauth_states(db)
+    
+    stale = db.query(OAuthState.state).filter(
+        OAuthState.user_id == user_id
+    ).order_by(OAuthState.created_at.desc()).offset(settings.oauth_state_max_per_user - 1).all()
+    if stale:
+        db.query(OAuthState).filter(
+            OAuthState.state.in_([row.state for row in stale])
+        ).delete(synchronize_session=False)
+    
+    state = secrets.token_urlsafe(32)
+    now = datetime.utcnow()
+    db.add(OAuthState(
+        state=state,
+        provider=provider,
+        user_id=user_id,
+        created_at=now,
+        expires_at=now + timedelta(seconds=settings.oauth_state_ttl_seconds)
+    ))
+    db.commit()
+    return state
+
+
+def consume_oauth_state(db, provider: str, state: str) -> Optional[str]:
+    """
+    Redeem an OAuth state once; returns its user_id, or None if unknown/expired
+    
+    The delete is conditional, so a state can't be redeemed twice even by
+    concurrent callbacks on different workers.
+    """
+    row = db.query(OAuthState).filter(
+        OAuthState.state == state,
+        OAuthState.provider == provider
+    ).first()
+    if row is None:
+        return None
+    
+    user_id, expired = row.user_id, row.expires_at <= datetime.utcnow()
+    deleted = db.query(OAuthState).filter(
+        OAuthState.state == state
+    ).delete(synchronize_session=False)
+    db.commit()
+    
+    if deleted != 1 or expired:
+        return None
+    return user_id
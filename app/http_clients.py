@@ -0,0 +1,30 @@
+"""
+Long-lived pooled HTTP clients for outbound API calls.
+
+Creating an httpx.AsyncClient per request throws away the connection pool
+(and the TLS handshake) every time. Routers fetch a named shared client
+here instead; all of them are closed on app shutdown.
+"""
+import httpx
+
+_clients: dict[str, httpx.AsyncClient] = {}
+
+
+def get_http_client(name: str, **kwargs) -> httpx.AsyncClient:
+    """
+    Get the shared client called `name`, creating it on first use
+
+    kwargs are passed to httpx.AsyncClient and only apply on creation.
+    """
+    client = _clients.get(name)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(**kwargs)
+        _clients[name] = client
+    return client
+
+
+async def close_http_clients():
+    """Close all shared clients (called from app lifespan)"""
+    for client in _clients.values():
+        await client.aclose()
+    _clients.clear()
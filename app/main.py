@@ -8,6 +8,8 @@ from app.config import get_settings
 from app.database import init_db, get_db, create_api_key, UsageLog, APIKey
 from app.routers import reddit, email, facebook, blog, twitter, github, discord, vercel, twilio
 from app.rate_limiter import limiter
+from app.http_clients import close_http_clients
+from app.vault import init_vault
 from slowapi.errors import RateLimitExceeded
 from datetime import datetime, timedelta
 
@@ -16,9 +18,17 @@ settings = get_settings()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Initialize database on startup"""
+    """Initialize database and background workers on startup"""
+    init_vault()  # Refuse to start without a usable credential encryption key
     init_db()
+    reddit.start_watch_scheduler()
+    email.start_email_workers()
+    email.start_event_writer()
     yield
+    await reddit.stop_watch_scheduler()
+    await email.stop_email_workers()
+    await email.stop_event_writer()
+    await close_http_clients()
 
 
 # Create FastAPI app
@@ -1,16 +1,258 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, Field, HttpUrl
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import json
+import time
 import httpx
 
 from app.auth import get_current_user
-from app.database import get_db, log_usage
+from app.cache import TTLCache
+from app.database import get_db, log_usage, log_usage_batch
 from app.config import get_settings
+from app.http_clients import get_http_client
 
 router = APIRouter(prefix="/api/discord", tags=["Discord"])
 settings = get_settings()
 
 
+# Rate limits
+# Discord reports a bucket per webhook (X-RateLimit-Bucket/Remaining/
+# Reset-After) plus a global limit. Sends to one webhook are serialized
+# and paced to its bucket, so a burst is delayed briefly rather than
+# answered with 429s; the global limit pauses every webhook.
+
+class WebhookState:
+    """Rate-limit bucket and send queue for one webhook"""
+    
+    def __init__(self):
+        self.lock = asyncio.Lock()  # FIFO: sends go out in arrival order
+        self.pending = 0
+        self.bucket: Optional[str] = None
+        self.remaining: Optional[int] = None
+        self.reset_at = 0.0  # Monotonic time the bucket refills
+
+
+# Idle webhooks live in an LRU. While sends are queued a webhook's state is
+# pinned in _busy_webhook_states instead, so eviction can never hand a new
+# request a fresh lock and bucket that ignore the queue in flight.
+webhook_states = TTLCache(maxsize=settings.discord_webhook_state_size)
+_busy_webhook_states: Dict[str, WebhookState] = {}
+_global_blocked_until = 0.0
+
+
+def get_discord_client() -> httpx.AsyncClient:
+    """Get the pooled HTTP client for Discord webhooks"""
+    return get_http_client(
+        "discord",
+        timeout=30.0,
+        limits=httpx.Limits(max_connections=settings.discord_max_connections)
+    )
+
+
+def get_webhook_state(webhook_url: str) -> WebhookState:
+    state = _busy_webhook_states.get(webhook_url) or webhook_states.get(webhook_url)
+    if state is None:
+        state = WebhookState()
+        webhook_states.set(webhook_url, state)
+    return state
+
+
+def rate_limited(retry_after: float) -> HTTPException:
+    retry_after = max(1, int(retry_after) + 1)
+    return HTTPException(
+        status_code=429,
+        detail=f"Discord rate limit reached for this webhook. Retry in {retry_after}s.",
+        headers={"Retry-After": str(retry_after)}
+    )
+
+
+async def wait_for_bucket(state: WebhookState):
+    """Sleep until the webhook may send, or raise 429 if that's too long"""
+    now = time.monotonic()
+    wait = max(_global_blocked_until - now, 0.0)
+    if state.remaining == 0:
+        wait = max(wait, state.reset_at - now)
+    
+    if wait > settings.discord_max_wait_seconds:
+        raise rate_limited(wait)
+    if wait > 0:
+        await asyncio.sleep(wait)
+
+
+def record_bucket(state: WebhookState, response: httpx.Response):
+    """Update bucket state from a response; handles 429 backoff"""
+    global _global_blocked_until
+    
+    headers = response.headers
+    now = time.monotonic()
+    if "X-RateLimit-Remaining" in headers:
+        state.bucket = headers.get("X-RateLimit-Bucket", state.bucket)
+        state.remaining = int(headers["X-RateLimit-Remaining"])
+        state.reset_at = now + float(headers.get("X-RateLimit-Reset-After", 0))
+    
+    if response.status_code == 429:
+        try:
+            data = response.json()
+        except ValueError:
+            data = {}
+        retry_after = float(data.get("retry_after") or headers.get("Retry-After") or 1)
+        if data.get("global") or headers.get("X-RateLimit-Global"):
+            _global_blocked_until = now + retry_after
+        else:
+            state.remaining = 0
+            state.reset_at = now + retry_after
+
+
+async def execute_webhook(webhook_url: str, payload: dict = None, body: bytes = None) -> Optional[str]:
+    """
+    Post a message through the webhook's send queue; returns the message ID
+    
+    Pass either `payload` or an already JSON-encoded `body`.
+    Waits out rate limits of up to discord_max_wait_seconds; beyond that,
+    or when the queue is full, raises 429 with Retry-After.
+    """
+    if body is None:
+        body = json.dumps(payload).encode('utf-8')
+    
+    state = get_webhook_state(webhook_url)
+    if state.pending >= settings.discord_max_queued_per_webhook:
+        raise rate_limited(max(state.reset_at - time.monotonic(), 1))
+    
+    state.pending += 1
+    _busy_webhook_states[webhook_url] = state
+    try:
+        async with state.lock:
+            for _ in range(3):
+                await wait_for_bucket(state)
+                response = await get_discord_client().post(
+                    webhook_url,
+                    content=body,
+                    headers={"Content-Type": "application/json"},
+                    params={"wait": "true"}  # Wait for Discord to return message ID
+                )
+                record_bucket(state, response)
+                if response.status_code != 429:
+                    break
+            else:
+                raise rate_limited(max(state.reset_at, _global_blocked_until) - time.monotonic())
+    finally:
+        state.pending -= 1
+        if not state.pending:
+            # Idle again: back under LRU eviction, as most recently used
+            del _busy_webhook_states[webhook_url]
+            webhook_states.set(webhook_url, state)
+    
+    if response.status_code not in [200, 204]:
+        raise HTTPException(
+            status_code=response.status_code,
+            detail=f"Discord webhook error: {response.text}"
+        )
+    
+    # Extract message ID if available
+    if response.status_code == 200:
+        return response.json().get("id")
+    return None
+
+
+# Coalescing
+# Opt-in (coalesce=true): messages for the same webhook, username and
+# avatar that arrive within discord_coalesce_window_seconds are merged
+# into one post, newline-joined in arrival order, within Discord's
+# 2000-character and 10-embed limits. Each caller waits for the merged
+# post and gets its message ID.
+
+MAX_CONTENT_LENGTH = 2000
+MAX_EMBEDS = 10
+
+
+class CoalescedBatch:
+    """Messages waiting to be merged into one webhook post"""
+    
+    def __init__(self, webhook_url: str, payload: dict):
+        self.webhook_url = webhook_url
+        self.base = {k: v for k, v in payload.items() if k not in ("content", "embeds")}
+        self.contents: List[str] = []
+        self.embeds: list = []
+        self.futures: List[asyncio.Future] = []
+        self.task: Optional[asyncio.Task] = None
+    
+    def fits(self, payload: dict) -> bool:
+        contents = self.contents + ([payload["content"]] if payload.get("content") else [])
+        embeds = len(self.embeds) + len(payload.get("embeds", []))
+        return len("\n".join(contents)) <= MAX_CONTENT_LENGTH and embeds <= MAX_EMBEDS
+    
+    def add(self, payload: dict) -> asyncio.Future:
+        if payload.get("content"):
+            self.contents.append(payload["content"])
+        self.embeds.extend(payload.get("embeds", []))
+        future = asyncio.get_running_loop().create_future()
+        self.futures.append(future)
+        return future
+    
+    def to_payload(self) -> dict:
+        payload = {**self.base, "content": "\n".join(self.contents)}
+        if self.embeds:
+            payload["embeds"] = self.embeds
+        return payload
+
+
+_coalescing: Dict[tuple, CoalescedBatch] = {}
+
+
+async def send_batch(key: tuple, batch: CoalescedBatch):
+    if _coalescing.get(key) is batch:
+        del _coalescing[key]  # Later messages start a new batch
+    
+    try:
+        message_id = await execute_webhook(batch.webhook_url, batch.to_payload())
+    except Exception as e:
+        for future in batch.futures:
+            if not future.done():
+                future.set_exception(e)
+    else:
+        for future in batch.futures:
+            if not future.done():
+                future.set_result((message_id, len(batch.futures)))
+
+
+async def flush_later(key: tuple, batch: CoalescedBatch):
+    await asyncio.sleep(settings.discord_coalesce_window_seconds)
+    await send_batch(key, batch)
+
+
+async def coalesce_webhook(webhook_url: str, payload: dict) -> Tuple[Optional[str], int]:
+    """
+    Send a message as part of a coalesced post
+    
+    Returns (message ID, number of messages merged into the post).
+    """
+    if not CoalescedBatch(webhook_url, payload).fits(payload):
+        return await execute_webhook(webhook_url, payload), 1
+    
+    key = (webhook_url, payload.get("username"), payload.get("avatar_url"))
+    batch = _coalescing.get(key)
+    if batch is not None and not batch.fits(payload):
+        # Full: send it now (ahead of this message) and start a new batch
+        batch.task.cancel()
+        batch.task = asyncio.create_task(send_batch(key, batch))
+        batch = None
+    
+    if batch is None:
+        batch = CoalescedBatch(webhook_url, payload)
+        _coalescing[key] = batch
+        batch.task = asyncio.create_task(flush_later(key, batch))
+    
+    return await batch.add(payload)
+
+
+def sent_message(text: str, merged: int) -> str:
+    if merged > 1:
+        return f"{text} (merged with {merged - 1} other message{'s' if merged > 2 else ''})"
+    return text
+
+
 # Request/Response Models
 class WebhookSendRequest(BaseModel):
     webhook_url: HttpUrl = Field(..., description="Discord webhook URL")
@@ -18,6 +260,7 @@ class WebhookSendRequest(BaseModel):
     username: str = Field(default="Agent API Proxy", max_length=80, description="Override bot username")
     avatar_url: HttpUrl = Field(default=None, description="Override bot avatar URL")
     embeds: list = Field(default=[], description="Rich embeds (optional)")
+    coalesce: bool = Field(default=False, description="Merge with other messages sent to this webhook within a short window")
 
 
 class WebhookSendResponse(BaseModel):
@@ -26,6 +269,29 @@ class WebhookSendResponse(BaseModel):
     message_id: str = None
 
 
+class WebhookFanoutRequest(BaseModel):
+    webhook_urls: List[HttpUrl] = Field(..., min_length=1, description="Discord webhook URLs")
+    content: str = Field(default="", max_length=2000, description="Message text")
+    username: str = Field(default="Agent API Proxy", max_length=80, description="Override bot username")
+    avatar_url: HttpUrl = Field(default=None, description="Override bot avatar URL")
+    embeds: list = Field(default=[], description="Rich embeds (optional)")
+
+
+class WebhookTargetResult(BaseModel):
+    webhook_url: str
+    success: bool
+    message_id: Optional[str] = None
+    status_code: Optional[int] = None
+    error: Optional[str] = None
+
+
+class WebhookFanoutResponse(BaseModel):
+    success: bool  # True only if every webhook accepted the message
+    sent: int
+    failed: int
+    results: List[WebhookTargetResult]
+
+
 @router.post("/webhook/send", response_model=WebhookSendResponse)
 async def send_webhook(
     request: WebhookSendRequest,
@@ -42,6 +308,10 @@ async def send_webhook(
     2. Create Webhook
     3. Copy Webhook URL
     
+    With `coalesce`, messages sent to the same webhook within a short
+    window are merged into one Discord message (fewer rate-limit hits);
+    each call still returns once its text has been posted.
+    
     Cost: $0.05 per message
     """
     try:
@@ -57,25 +327,11 @@ async def send_webhook(
         if request.embeds:
             payload["embeds"] = request.embeds
         
-        # Send to Discord webhook
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                str(request.webhook_url),
-                json=payload,
-                params={"wait": "true"}  # Wait for Discord to return message ID
-            )
-            
-            if response.status_code not in [200, 204]:
-                raise HTTPException(
-                    status_code=response.status_code,
-                    detail=f"Discord webhook error: {response.text}"
-                )
-            
-            # Extract message ID if available
-            message_id = None
-            if response.status_code == 200:
-                data = response.json()
-                message_id = data.get("id")
+        # Send to Discord webhook (queued and paced per webhook)
+        if request.coalesce:
+            message_id, merged = await coalesce_webhook(str(request.webhook_url), payload)
+        else:
+            message_id, merged = await execute_webhook(str(request.webhook_url), payload), 1
         
         # Log successful usage
         log_usage(
@@ -88,7 +344,7 @@ async def send_webhook(
         
         return WebhookSendResponse(
             success=True,
-            message="Message sent to Discord",
+            message=sent_message("Message sent to Discord", merged),
             message_id=message_id
         )
         
@@ -147,6 +403,7 @@ class WebhookSendEmbedRequest(BaseModel):
     embed: Embed = Field(..., description="Rich embed to send")
     username: str = Field(default="Agent API Proxy", max_length=80)
     avatar_url: HttpUrl = Field(default=None)
+    coalesce: bool = Field(default=False, description="Merge with other messages sent to this webhook within a short window")
 
 
 @router.post("/webhook/send-embed", response_model=WebhookSendResponse)
@@ -207,25 +464,11 @@ async def send_webhook_embed(
         if request.avatar_url:
             payload["avatar_url"] = str(request.avatar_url)
         
-        # Send to Discord webhook
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                str(request.webhook_url),
-                json=payload,
-                params={"wait": "true"}
-            )
-            
-            if response.status_code not in [200, 204]:
-                raise HTTPException(
-                    status_code=response.status_code,
-                    detail=f"Discord webhook error: {response.text}"
-                )
-            
-            # Extract message ID if available
-            message_id = None
-            if response.status_code == 200:
-                data = response.json()
-                message_id = data.get("id")
+        # Send to Discord webhook (queued and paced per webhook)
+        if request.coalesce:
+            message_id, merged = await coalesce_webhook(str(request.webhook_url), payload)
+        else:
+            message_id, merged = await execute_webhook(str(request.webhook_url), payload), 1
         
         # Log successful usage
         log_usage(
@@ -238,7 +481,7 @@ async def send_webhook_embed(
         
         return WebhookSendResponse(
             success=True,
-            message="Embed sent to Discord",
+            message=sent_message("Embed sent to Discord", merged),
             message_id=message_id
         )
         
@@ -259,3 +502,74 @@ async def send_webhook_embed(
             status_code=500,
             detail=f"Failed to send embed: {str(e)}"
         )
+
+
+@router.post("/webhook/fanout", response_model=WebhookFanoutResponse)
+async def fanout_webhook(
+    request: WebhookFanoutRequest,
+    user_id: str = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Send the same message to many Discord webhooks at once
+    
+    The message is encoded once and posted to the webhooks concurrently,
+    each through its own rate-limit queue. Results are reported per
+    webhook (duplicate URLs are sent once).
+    
+    Cost: $0.05 per webhook delivered
+    """
+    webhook_urls = list(dict.fromkeys(str(url) for url in request.webhook_urls))
+    if len(webhook_urls) > settings.discord_fanout_max_targets:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many webhooks (max {settings.discord_fanout_max_targets})"
+        )
+    
+    payload = {
+        "content": request.content,
+        "username": request.username,
+    }
+    
+    if request.avatar_url:
+        payload["avatar_url"] = str(request.avatar_url)
+    
+    if request.embeds:
+        payload["embeds"] = request.embeds
+    
+    body = json.dumps(payload).encode('utf-8')
+    slots = asyncio.Semaphore(settings.discord_fanout_concurrency)
+    
+    async def send(webhook_url: str) -> WebhookTargetResult:
+        try:
+            async with slots:
+                message_id = await execute_webhook(webhook_url, body=body)
+            return WebhookTargetResult(webhook_url=webhook_url, success=True, message_id=message_id)
+        except HTTPException as e:
+            return WebhookTargetResult(
+                webhook_url=webhook_url, success=False, status_code=e.status_code, error=str(e.detail)
+            )
+        except Exception as e:
+            return WebhookTargetResult(webhook_url=webhook_url, success=False, error=str(e))
+    
+    results = await asyncio.gather(*(send(url) for url in webhook_urls))
+    
+    # Log usage per webhook in one batch
+    log_usage_batch(db, [
+        {
+            "user_id": user_id,
+            "endpoint": "/api/discord/webhook/fanout",
+            "cost": settings.cost_discord_webhook if result.success else 0,  # Don't charge for failures
+            "success": result.success,
+            "error_message": result.error
+        }
+        for result in results
+    ])
+    
+    sent = sum(1 for result in results if result.success)
+    return WebhookFanoutResponse(
+        success=sent == len(results),
+        sent=sent,
+        failed=len(results) - sent,
+        results=results
+    )
@@ -1,32 +1,134 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, UploadFile
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
-from pydantic import BaseModel, EmailStr, Field
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail
+from pydantic import BaseModel, EmailStr, Field, HttpUrl, ValidationError, model_validator
+from typing import AsyncIterator, Dict, List, Optional
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from email.utils import make_msgid
+import asyncio
+import html
+import json
+import re
+import secrets
+import smtplib
+import time
+import httpx
 
 from app.auth import get_current_user
-from app.database import get_db, log_usage
+from app.cache import TTLCache
+from app.database import get_db, log_usage, log_usage_batch, SessionLocal, EmailJob, EmailTemplate, EmailEvent, SentEmail
 from app.config import get_settings
+from app.http_clients import get_http_client
+from app.streaming import (
+    base64_length, iter_base64, iter_upload_file, json_fragment,
+    LimitedMultiPartParser, PartTooLarge
+)
+from starlette.datastructures import FormData, UploadFile as StarletteUploadFile
+from starlette.formparsers import MultiPartException
+from sendgrid.helpers.eventwebhook import EventWebhook, EventWebhookHeader
 
 router = APIRouter(prefix="/api/email", tags=["Email"])
 settings = get_settings()
 
 
 # Request/Response Models
-class EmailSendRequest(BaseModel):
+class TemplateContentMixin(BaseModel):
+    """Either an inline subject/body or a stored template"""
+    subject: Optional[str] = Field(default=None, min_length=1, max_length=200)
+    body: Optional[str] = Field(default=None, min_length=1, max_length=100000)
+    template_id: Optional[int] = Field(default=None, description="Stored template (from /api/email/templates)")
+    
+    @model_validator(mode="after")
+    def check_content(self):
+        if self.template_id is None and not (self.subject and self.body):
+            raise ValueError("Provide subject and body, or template_id")
+        if self.template_id is not None and (self.subject or self.body):
+            raise ValueError("template_id can't be combined with subject or body")
+        return self
+
+
+class EmailSendRequest(TemplateContentMixin):
     to: EmailStr
+    variables: Dict[str, str] = Field(default={}, description="Template variables")
+    async_delivery: bool = Field(default=False, description="Queue and return 202 immediately")
+    callback_url: Optional[HttpUrl] = Field(default=None, description="Notified when a queued email is sent or fails")
+
+
+class EmailSendResponse(BaseModel):
+    success: bool
+    message: str
+    message_id: str = None
+    provider: Optional[str] = None
+    job_id: Optional[str] = None
+    status: Optional[str] = None
+
+
+class EmailJobResponse(BaseModel):
+    job_id: str
+    status: str  # queued, sending, sent, failed
+    attempts: int
+    message_id: Optional[str] = None
+    last_error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+
+class BulkRecipient(BaseModel):
+    to: EmailStr
+    substitutions: Dict[str, str] = Field(
+        default={},
+        description="Per-recipient replacements, e.g. {\"-name-\": \"Ada\"}"
+    )
+    variables: Dict[str, str] = Field(default={}, description="Template variables")
+
+
+class EmailBulkSendRequest(TemplateContentMixin):
+    recipients: List[BulkRecipient] = Field(..., min_length=1, max_length=1000)
+
+
+class EmailEventInfo(BaseModel):
+    event: str
+    email: Optional[str] = None
+    timestamp: datetime
+    reason: Optional[str] = None
+    url: Optional[str] = None
+
+
+class EmailStatusResponse(BaseModel):
+    message_id: str
+    status: Dict[str, str]  # Latest event per recipient
+    events: List[EmailEventInfo]
+
+
+class EmailTemplateRequest(BaseModel):
+    name: str = Field(..., min_length=1, max_length=100)
     subject: str = Field(..., min_length=1, max_length=200)
     body: str = Field(..., min_length=1, max_length=100000)
 
 
-class EmailSendResponse(BaseModel):
+class EmailTemplateInfo(BaseModel):
+    template_id: int
+    name: str
+    variables: List[str]
+    updated_at: datetime
+
+
+class EmailTemplateListResponse(BaseModel):
+    success: bool
+    templates: List[EmailTemplateInfo]
+
+
+class EmailBulkSendResponse(BaseModel):
     success: bool
     message: str
+    recipients: int
     message_id: str = None
 
 
-def get_sendgrid_client():
-    """Get configured SendGrid client"""
+def get_sendgrid_client() -> httpx.AsyncClient:
+    """Get the pooled HTTP client for the SendGrid v3 API"""
     if not settings.sendgrid_api_key:
         raise HTTPException(
             status_code=503,
@@ -39,65 +141,1189 @@ def get_sendgrid_client():
             detail="SendGrid from_email not configured on server"
         )
     
-    return SendGridAPIClient(settings.sendgrid_api_key)
+    return get_http_client(
+        "sendgrid",
+        base_url="https://api.sendgrid.com",
+        headers={"Authorization": f"Bearer {settings.sendgrid_api_key}"},
+        timeout=30.0,
+        limits=httpx.Limits(max_connections=settings.sendgrid_max_connections)
+    )
+
+
+def text_to_html(body: str) -> str:
+    return body.replace('\n', '<br>')
+
+
+def build_mail_payload(personalizations: List[dict], subject: str, html_body: str) -> dict:
+    """Build a v3 mail/send payload"""
+    return {
+        "personalizations": personalizations,
+        "from": {"email": settings.sendgrid_from_email},
+        "subject": subject,
+        "content": [{"type": "text/html", "value": html_body}]
+    }
+
+
+# Templates
+# A template is compiled once into literal/variable segments (with the
+# newline -> <br> conversion already applied) and kept in an LRU keyed by
+# id; updated_at tells us when a cached copy is stale.
+
+TEMPLATE_VARIABLE = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+template_cache = TTLCache(maxsize=settings.email_template_cache_size)
+
+
+class CompiledTemplate:
+    """Pre-split subject and HTML body of a stored template"""
+    
+    def __init__(self, subject: str, body: str):
+        self.subject_parts = self.compile(subject, as_html=False)
+        self.body_parts = self.compile(body, as_html=True)
+        self.variables = sorted({
+            part for parts in (self.subject_parts, self.body_parts)
+            for i, part in enumerate(parts) if i % 2
+        })
+    
+    @staticmethod
+    def compile(text: str, as_html: bool) -> List[str]:
+        """Split into [literal, variable, literal, variable, ..., literal]"""
+        parts = TEMPLATE_VARIABLE.split(text)
+        if as_html:
+            parts[::2] = [text_to_html(literal) for literal in parts[::2]]
+        return parts
+    
+    @staticmethod
+    def fill(parts: List[str], values: Dict[str, str]) -> str:
+        return "".join(
+            values[part] if i % 2 else part
+            for i, part in enumerate(parts)
+        )
+    
+    def render(self, variables: Dict[str, str]) -> tuple[str, str]:
+        """Return (subject, html) with variables filled in"""
+        missing = [name for name in self.variables if name not in variables]
+        if missing:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Missing template variables: {', '.join(missing)}"
+            )
+        return (
+            self.fill(self.subject_parts, variables),
+            self.fill(self.body_parts, {k: html.escape(v) for k, v in variables.items()})
+        )
+    
+    def personalize(self, variables: Dict[str, str]) -> tuple[str, Dict[str, str]]:
+        """
+        Return (subject, substitutions) for one bulk recipient
+        
+        The body is sent once as placeholder_html(); SendGrid fills the
+        {{name}} tags from each personalization's substitutions.
+        """
+        subject, _ = self.render(variables)  # Validates variables
+        return subject, {
+            "{{%s}}" % name: html.escape(variables[name])
+            for name in self.variables
+        }
+    
+    def placeholder_html(self) -> str:
+        return self.fill(self.body_parts, {name: "{{%s}}" % name for name in self.variables})
+
+
+def get_compiled_template(db: Session, user_id: str, template_id: int) -> CompiledTemplate:
+    """Load a user's template, compiling it only when not cached"""
+    row = db.query(EmailTemplate.updated_at).filter(
+        EmailTemplate.id == template_id,
+        EmailTemplate.user_id == user_id
+    ).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Email template not found")
+    
+    cached = template_cache.get(template_id)
+    if cached and cached[0] == row.updated_at:
+        return cached[1]
+    
+    template = db.query(EmailTemplate).filter(EmailTemplate.id == template_id).first()
+    compiled = CompiledTemplate(template.subject, template.body)
+    template_cache.set(template_id, (template.updated_at, compiled))
+    return compiled
+
+
+def record_sent_email(db: Session, user_id: str, message_id: Optional[str]):
+    """Remember who sent a message; committed with the caller's usage log"""
+    if message_id and message_id != "unknown":
+        db.add(SentEmail(message_id=message_id, user_id=user_id))
+
+
+class EmailRejected(Exception):
+    """
+    The provider refused the message itself (bad address, invalid payload)
+    
+    Answered as 400; anything wrong on the provider's side (auth, sender
+    verification, limits) is an ordinary backend failure instead.
+    """
+
+
+# SendGrid statuses that mean the payload itself is invalid
+SENDGRID_PAYLOAD_ERRORS = (400, 422)
+
+
+def sendgrid_message_id(response: httpx.Response) -> str:
+    """Check a mail/send response and return SendGrid's message ID"""
+    if response.status_code in SENDGRID_PAYLOAD_ERRORS:
+        raise EmailRejected(f"SendGrid rejected the email ({response.status_code}): {response.text}")
+    if response.status_code != 202:
+        raise Exception(f"SendGrid API error ({response.status_code}): {response.text}")
+    
+    return response.headers.get('X-Message-Id', 'unknown')
+
+
+async def sendgrid_send(payload: dict) -> str:
+    """Send a v3 mail/send payload and return SendGrid's message ID"""
+    client = get_sendgrid_client()
+    response = await client.post("/v3/mail/send", json=payload)
+    return sendgrid_message_id(response)
+
+
+async def sendgrid_send_stream(content: AsyncIterator[bytes], content_length: int) -> str:
+    """Send a pre-encoded mail/send JSON body as a stream"""
+    client = get_sendgrid_client()
+    response = await client.post(
+        "/v3/mail/send",
+        content=content,
+        headers={"Content-Type": "application/json", "Content-Length": str(content_length)}
+    )
+    return sendgrid_message_id(response)
+
+
+# Delivery backends
+# Single-recipient mail goes through an ordered list of backends (SendGrid,
+# then an SMTP relay). Each keeps a moving average of latency and error
+# rate; an unhealthy one is skipped for a cool-down so sends fail over
+# instead of hanging on a degraded provider.
+
+class BackendHealth:
+    """Exponentially weighted latency/error stats with a simple circuit"""
+    
+    ALPHA = 0.3  # Weight of the newest sample
+    
+    def __init__(self):
+        self.latency = 0.0
+        self.error_rate = 0.0
+        self.open_until = 0.0
+    
+    def available(self) -> bool:
+        return time.monotonic() >= self.open_until
+    
+    def record(self, latency: float, success: bool):
+        if success and self.open_until:
+            # Trial send after a cool-down worked: start over
+            self.latency, self.error_rate, self.open_until = latency, 0.0, 0.0
+        else:
+            self.latency += self.ALPHA * (latency - self.latency)
+            self.error_rate += self.ALPHA * ((0.0 if success else 1.0) - self.error_rate)
+        
+        if (self.error_rate >= settings.email_backend_error_threshold
+                or self.latency >= settings.email_backend_slow_seconds):
+            self.open_until = time.monotonic() + settings.email_backend_cooldown_seconds
+
+
+class EmailBackend(ABC):
+    """A way of delivering one HTML email"""
+    
+    name = "base"
+    
+    def __init__(self):
+        self.health = BackendHealth()
+    
+    @abstractmethod
+    def configured(self) -> bool:
+        ...
+    
+    @abstractmethod
+    async def send(self, to_email: str, subject: str, html_body: str) -> str:
+        """Deliver the message and return a provider message ID"""
+
+
+class SendGridBackend(EmailBackend):
+    name = "sendgrid"
+    
+    def configured(self) -> bool:
+        return bool(settings.sendgrid_api_key and settings.sendgrid_from_email)
+    
+    async def send(self, to_email: str, subject: str, html_body: str) -> str:
+        payload = build_mail_payload(
+            personalizations=[{"to": [{"email": to_email}]}],
+            subject=subject,
+            html_body=html_body
+        )
+        return await sendgrid_send(payload)
+
+
+class SMTPBackend(EmailBackend):
+    name = "smtp"
+    
+    def configured(self) -> bool:
+        return bool(settings.smtp_host and (settings.smtp_from_email or settings.sendgrid_from_email))
+    
+    async def send(self, to_email: str, subject: str, html_body: str) -> str:
+        message = EmailMessage()
+        message["From"] = settings.smtp_from_email or settings.sendgrid_from_email
+        message["To"] = to_email
+        message["Subject"] = subject
+        message["Message-ID"] = make_msgid()
+        message.set_content(html_body, subtype="html")
+        
+        # smtplib blocks; keep it off the event loop
+        try:
+            await asyncio.to_thread(self._deliver, message)
+        except smtplib.SMTPRecipientsRefused as e:
+            raise EmailRejected(f"SMTP relay refused the recipient: {e.recipients}")
+        return message["Message-ID"].strip("<>")
+    
+    def _deliver(self, message: EmailMessage):
+        with smtplib.SMTP(settings.smtp_host, settings.smtp_port,
+                          timeout=settings.email_backend_timeout) as smtp:
+            if settings.smtp_use_tls:
+                smtp.starttls()
+            if settings.smtp_username:
+                smtp.login(settings.smtp_username, settings.smtp_password)
+            smtp.send_message(message)
+
+
+class EmailBackendRouter:
+    """
+    Send through the first healthy backend, failing over in order
+    
+    Timeouts, transport errors and provider errors count against a backend
+    and fail over; only an EmailRejected (the caller's bad input) goes
+    straight back.
+    """
+    
+    def __init__(self, backends: List[EmailBackend]):
+        self.backends = backends
+    
+    def configured_backends(self) -> List[EmailBackend]:
+        backends = [backend for backend in self.backends if backend.configured()]
+        if not backends:
+            raise HTTPException(
+                status_code=503,
+                detail="No email backend configured on server"
+            )
+        return backends
+    
+    async def send(self, to_email: str, subject: str, html_body: str) -> tuple[str, str]:
+        """Deliver a message; returns (backend name, message ID)"""
+        backends = self.configured_backends()
+        # Healthy backends first; unhealthy ones are still a last resort
+        ordered = [b for b in backends if b.health.available()] + \
+                  [b for b in backends if not b.health.available()]
+        
+        errors = []
+        for backend in ordered:
+            started = time.monotonic()
+            try:
+                message_id = await asyncio.wait_for(
+                    backend.send(to_email, subject, html_body),
+                    timeout=settings.email_backend_timeout
+                )
+            except (HTTPException, EmailRejected):
+                raise  # The request's fault, not the backend's
+            except Exception as e:
+                backend.health.record(time.monotonic() - started, success=False)
+                errors.append(f"{backend.name}: {str(e) or type(e).__name__}")
+                continue
+            backend.health.record(time.monotonic() - started, success=True)
+            return backend.name, message_id
+        
+        raise Exception("; ".join(errors))
+
+
+email_backends = EmailBackendRouter([SendGridBackend(), SMTPBackend()])
+
+
+# Attachments
+# The multipart parser spools uploads to temp files, refusing any that go
+# over the size limits as they stream in. The outbound JSON is
+# generated in chunks, base64-encoding each file on the fly, so memory per
+# send stays flat however large the attachments are.
+
+def upload_size(upload: UploadFile) -> int:
+    if upload.size is not None:
+        return upload.size
+    upload.file.seek(0, 2)
+    return upload.file.tell()
+
+
+def attachment_stream(payload: dict, uploads: List[UploadFile], sizes: List[int]) -> tuple[AsyncIterator[bytes], int]:
+    """Return (body chunks, exact body length) for payload plus attachments"""
+    head = json_fragment(payload)[:-1] + b',"attachments":['
+    tail = b']}'
+    
+    prefixes = []
+    length = len(head) + len(tail)
+    for index, (upload, size) in enumerate(zip(uploads, sizes)):
+        prefix = (
+            (b',' if index else b'')
+            + b'{"filename":' + json_fragment(upload.filename or f"attachment-{index + 1}")
+            + b',"type":' + json_fragment(upload.content_type or "application/octet-stream")
+            + b',"disposition":"attachment","content":"'
+        )
+        prefixes.append(prefix)
+        length += len(prefix) + base64_length(size) + len(b'"}')
+    
+    async def generate():
+        yield head
+        for prefix, upload in zip(prefixes, uploads):
+            yield prefix
+            async for chunk in iter_base64(iter_upload_file(upload)):
+                yield chunk
+            yield b'"}'
+        yield tail
+    
+    return generate(), length
+
+
+# Delivery queue
+# Jobs live in the email_jobs table, so queued mail survives restarts and
+# SendGrid outages. Workers claim a job by flipping queued -> sending.
+
+_email_workers = []
+_queue_wakeup = asyncio.Event()
+_last_lease_sweep = 0.0
+
+
+def job_to_response(job: EmailJob) -> EmailJobResponse:
+    return EmailJobResponse(
+        job_id=job.job_id,
+        status=job.status,
+        attempts=job.attempts,
+        message_id=job.message_id,
+        last_error=job.last_error,
+        created_at=job.created_at,
+        updated_at=job.updated_at
+    )
+
+
+def claim_next_job(db: Session) -> Optional[EmailJob]:
+    """Claim the next due job; another worker that got there first wins"""
+    now = datetime.utcnow()
+    while True:
+        job = db.query(EmailJob).filter(
+            EmailJob.status == "queued",
+            EmailJob.next_attempt_at <= now
+        ).order_by(EmailJob.next_attempt_at).first()
+        if not job:
+            return None
+        
+        claimed = db.query(EmailJob).filter(
+            EmailJob.id == job.id,
+            EmailJob.status == "queued"
+        ).update({"status": "sending", "updated_at": now}, synchronize_session=False)
+        db.commit()
+        if claimed:
+            db.refresh(job)
+            return job
+
+
+def requeue_stale_jobs(db: Session) -> List[EmailJob]:
+    """
+    Return jobs stuck in "sending" (e.g. worker crashed) to the queue
+    
+    A lost lease counts as an attempt, so a job that keeps crashing its
+    worker fails once it reaches email_max_attempts. Returns those jobs.
+    """
+    now = datetime.utcnow()
+    cutoff = now - timedelta(seconds=settings.email_send_lease_seconds)
+    stale = db.query(EmailJob).filter(
+        EmailJob.status == "sending",
+        EmailJob.updated_at < cutoff
+    ).all()
+    
+    failed = []
+    for job in stale:
+        attempts = job.attempts + 1
+        status = "failed" if attempts >= settings.email_max_attempts else "queued"
+        # Conditional, so only one worker requeues each job
+        updated = db.query(EmailJob).filter(
+            EmailJob.id == job.id,
+            EmailJob.status == "sending",
+            EmailJob.updated_at == job.updated_at
+        ).update({
+            "status": status,
+            "attempts": attempts,
+            "last_error": "Delivery interrupted (worker lease expired)",
+            "updated_at": now
+        }, synchronize_session=False)
+        db.commit()
+        if updated and status == "failed":
+            db.refresh(job)
+            failed.append(job)
+    return failed
+
+
+async def notify_callback(job: EmailJob):
+    """POST a job's final status to its callback URL (best effort)"""
+    if not job.callback_url:
+        return
+    try:
+        client = get_http_client("email-callbacks", timeout=10.0)
+        await client.post(job.callback_url, json=job_to_response(job).model_dump(mode="json"))
+    except Exception as e:
+        print(f"❌ Email job {job.job_id} callback failed: {e}")
+
+
+async def deliver_job(db: Session, job: EmailJob):
+    """Attempt delivery of a claimed job, scheduling a retry on failure"""
+    try:
+        _, job.message_id = await email_backends.send(job.to_email, job.subject, job.body)
+        job.status = "sent"
+        job.last_error = None
+        record_sent_email(db, job.user_id, job.message_id)
+    except Exception as e:
+        job.attempts += 1
+        job.last_error = str(e)
+        if isinstance(e, EmailRejected) or job.attempts >= settings.email_max_attempts:
+            job.status = "failed"  # Rejected mail won't succeed on retry
+        else:
+            delay = min(
+                settings.email_retry_base_seconds * 2 ** (job.attempts - 1),
+                settings.email_retry_max_seconds
+            )
+            job.status = "queued"
+            job.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+    
+    job.updated_at = datetime.utcnow()
+    db.commit()
+    await finish_job(db, job)
+
+
+async def finish_job(db: Session, job: EmailJob):
+    """Log usage and notify the callback once a job is sent or has failed"""
+    if job.status == "sent":
+        log_usage(
+            db=db,
+            user_id=job.user_id,
+            endpoint="/api/email/send",
+            cost=settings.cost_email_send,
+            success=True
+        )
+    elif job.status == "failed":
+        log_usage(
+            db=db,
+            user_id=job.user_id,
+            endpoint="/api/email/send",
+            cost=0,  # Don't charge for failures
+            success=False,
+            error_message=job.last_error
+        )
+    
+    if job.status in ("sent", "failed"):
+        await notify_callback(job)
+
+
+async def sweep_stale_jobs(db: Session):
+    """Requeue expired leases, at most once per sweep interval per process"""
+    global _last_lease_sweep
+    if time.monotonic() - _last_lease_sweep < settings.email_lease_sweep_seconds:
+        return
+    _last_lease_sweep = time.monotonic()
+    
+    for failed in requeue_stale_jobs(db):
+        await finish_job(db, failed)
+
+
+async def process_next_job() -> bool:
+    """Deliver one due job; returns False when the queue is idle"""
+    db = SessionLocal()
+    try:
+        await sweep_stale_jobs(db)
+        job = claim_next_job(db)
+        if job is None:
+            return False
+        await deliver_job(db, job)
+        return True
+    finally:
+        db.close()
+
+
+async def email_worker():
+    """Background loop delivering queued email"""
+    while True:
+        try:
+            busy = await process_next_job()
+        except Exception as e:
+            print(f"❌ Email worker error: {e}")
+            busy = False
+        
+        if not busy:
+            try:
+                await asyncio.wait_for(_queue_wakeup.wait(), timeout=settings.email_queue_poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+            _queue_wakeup.clear()
+
+
+def start_email_workers():
+    """Start the delivery worker pool (called from app lifespan)"""
+    if not _email_workers:
+        for _ in range(settings.email_worker_count):
+            _email_workers.append(asyncio.create_task(email_worker()))
+
+
+async def stop_email_workers():
+    """Stop the delivery worker pool (called from app lifespan)"""
+    for task in _email_workers:
+        task.cancel()
+    await asyncio.gather(*_email_workers, return_exceptions=True)
+    _email_workers.clear()
+
+
+def enqueue_email(db: Session, user_id: str, request: EmailSendRequest,
+                  subject: str, html_body: str) -> EmailJob:
+    """Persist an email for background delivery"""
+    job = EmailJob(
+        job_id=f"job_{secrets.token_urlsafe(16)}",
+        user_id=user_id,
+        to_email=request.to,
+        subject=subject,
+        body=html_body,
+        callback_url=str(request.callback_url) if request.callback_url else None
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    _queue_wakeup.set()
+    return job
+
+
+# Event webhook
+# SendGrid posts events in large batches. The receiver only verifies and
+# parses, then hands rows to a writer task that inserts them in bulk, so
+# the webhook acks quickly and the database sees one commit per batch.
+
+_event_queue: asyncio.Queue = asyncio.Queue(maxsize=settings.email_event_queue_max)
+_event_batch: List[dict] = []  # Rows taken off the queue but not yet written
+_event_writer = None
+_event_webhook = None
+
+
+def get_event_webhook() -> EventWebhook:
+    """Get the signature verifier for the configured webhook public key"""
+    global _event_webhook
+    
+    if not settings.sendgrid_webhook_public_key:
+        raise HTTPException(
+            status_code=503,
+            detail="SendGrid event webhook not configured on server"
+        )
+    
+    if _event_webhook is None:
+        _event_webhook = EventWebhook(settings.sendgrid_webhook_public_key)
+    return _event_webhook
+
+
+def verify_event_signature(payload: str, signature: str, timestamp: str) -> bool:
+    try:
+        return get_event_webhook().verify_signature(payload, signature, timestamp)
+    except HTTPException:
+        raise
+    except Exception:
+        return False
+
+
+def event_to_row(event: dict) -> Optional[dict]:
+    """Map a SendGrid event to an email_events row (None if unusable)"""
+    sg_message_id = event.get("sg_message_id")
+    if not sg_message_id or "event" not in event:
+        return None
+    try:
+        timestamp = datetime.utcfromtimestamp(int(event["timestamp"]))
+    except (KeyError, TypeError, ValueError):
+        return None
+    
+    return {
+        # sg_message_id is the X-Message-Id plus a ".filter..." suffix
+        "message_id": sg_message_id.split(".")[0],
+        "sg_event_id": event.get("sg_event_id"),
+        "event": event["event"],
+        "email": event.get("email"),
+        "timestamp": timestamp,
+        "reason": event.get("reason") or event.get("response"),
+        "url": event.get("url"),
+        "received_at": datetime.utcnow()
+    }
+
+
+def write_event_rows(rows: List[dict]):
+    db = SessionLocal()
+    try:
+        db.execute(insert(EmailEvent), rows)
+        db.commit()
+    finally:
+        db.close()
+
+
+async def email_event_writer():
+    """
+    Background loop writing webhook events in batches
+    
+    SendGrid has already been told these events were received, so a failed
+    write is retried with backoff rather than dropped. While it retries the
+    queue backs up and /events returns 503, so SendGrid holds the rest.
+    """
+    while True:
+        _event_batch.extend(await _event_queue.get())
+        deadline = time.monotonic() + settings.email_event_flush_seconds
+        
+        while len(_event_batch) < settings.email_event_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                _event_batch.extend(await asyncio.wait_for(_event_queue.get(), timeout=timeout))
+            except asyncio.TimeoutError:
+                break
+        
+        delay = settings.email_event_retry_base_seconds
+        while True:
+            try:
+                await asyncio.to_thread(write_event_rows, list(_event_batch))
+                break
+            except Exception as e:
+                print(f"❌ Email event writer error ({len(_event_batch)} events, retrying in {delay}s): {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, settings.email_event_retry_max_seconds)
+        _event_batch.clear()
+
+
+def start_event_writer():
+    """Start the webhook event writer (called from app lifespan)"""
+    global _event_writer
+    if _event_writer is None:
+        _event_writer = asyncio.create_task(email_event_writer())
+
+
+async def stop_event_writer():
+    """Stop the writer and flush buffered events (called from app lifespan)"""
+    global _event_writer
+    if _event_writer is not None:
+        _event_writer.cancel()
+        await asyncio.gather(_event_writer, return_exceptions=True)
+        _event_writer = None
+    
+    # Includes a batch the writer was still retrying
+    rows = list(_event_batch)
+    _event_batch.clear()
+    while not _event_queue.empty():
+        rows.extend(_event_queue.get_nowait())
+    if rows:
+        await asyncio.to_thread(write_event_rows, rows)
 
 
 @router.post("/send", response_model=EmailSendResponse)
 async def send_email(
     request: EmailSendRequest,
+    response: Response,
     user_id: str = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
-    Send an email via SendGrid
+    Send an email via SendGrid, failing over to the SMTP relay
+    
+    Requires SendGrid and/or an SMTP relay configured on server. While
+    SendGrid is slow or erroring, mail goes out through the relay; the
+    response's `provider` says which one delivered it.
+    
+    Instead of `subject`/`body`, pass `template_id` and `variables` to
+    send a stored template. Variable values are HTML-escaped.
+    
+    With `async_delivery`, the email is stored in a durable queue and the
+    call returns 202 with a `job_id` right away. Delivery is retried with
+    backoff; poll /api/email/jobs/{job_id} or pass `callback_url` to be
+    notified. Queued emails are charged once delivered.
     
-    Requires valid SendGrid API key configured on server.
     Cost: $0.15 per email
     """
+    if request.template_id is not None:
+        subject, html_body = get_compiled_template(db, user_id, request.template_id).render(request.variables)
+    else:
+        subject, html_body = request.subject, text_to_html(request.body)
+    
+    if request.async_delivery:
+        email_backends.configured_backends()  # Fail fast if no backend is configured
+        job = enqueue_email(db, user_id, request, subject, html_body)
+        response.status_code = 202
+        return EmailSendResponse(
+            success=True,
+            message="Email queued for delivery",
+            job_id=job.job_id,
+            status=job.status
+        )
+    
     try:
-        sg = get_sendgrid_client()
+        # Send through the first healthy backend
+        provider, message_id = await email_backends.send(request.to, subject, html_body)
+        record_sent_email(db, user_id, message_id)
         
-        # Create email message
-        message = Mail(
-            from_email=settings.sendgrid_from_email,
-            to_emails=request.to,
-            subject=request.subject,
-            html_content=request.body.replace('\n', '<br>')
+        # Log successful usage
+        log_usage(
+            db=db,
+            user_id=user_id,
+            endpoint="/api/email/send",
+            cost=settings.cost_email_send,
+            success=True
+        )
+        
+        return EmailSendResponse(
+            success=True,
+            message="Email sent successfully",
+            message_id=message_id,
+            provider=provider
+        )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        # Log failed usage
+        log_usage(
+            db=db,
+            user_id=user_id,
+            endpoint="/api/email/send",
+            cost=0,  # Don't charge for failures
+            success=False,
+            error_message=str(e)
         )
         
-        # Send email
-        response = sg.send(message)
+        raise HTTPException(
+            status_code=400 if isinstance(e, EmailRejected) else 500,
+            detail=f"Failed to send email: {str(e)}"
+        )
+
+
+@router.post("/send-bulk", response_model=EmailBulkSendResponse)
+async def send_bulk_email(
+    request: EmailBulkSendRequest,
+    user_id: str = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Send one email to up to 1000 recipients in a single SendGrid call
+    
+    Each recipient gets their own personalization, so recipients don't see
+    each other. Substitution keys found in the subject or body are replaced
+    per recipient. With `template_id`, each recipient's `variables` fill
+    the template's {{ variables }}.
+    
+    Cost: $0.15 per recipient
+    """
+    compiled = None
+    if request.template_id is not None:
+        compiled = get_compiled_template(db, user_id, request.template_id)
+    
+    try:
+        personalizations = []
+        for recipient in request.recipients:
+            personalization = {"to": [{"email": recipient.to}]}
+            substitutions = dict(recipient.substitutions)
+            if compiled:
+                personalization["subject"], variables = compiled.personalize(recipient.variables)
+                substitutions.update(variables)
+            if substitutions:
+                personalization["substitutions"] = substitutions
+            personalizations.append(personalization)
+        
+        if compiled:
+            subject, html_body = personalizations[0]["subject"], compiled.placeholder_html()
+        else:
+            subject, html_body = request.subject, text_to_html(request.body)
+        
+        payload = build_mail_payload(personalizations, subject, html_body)
+        message_id = await sendgrid_send(payload)
+        record_sent_email(db, user_id, message_id)
         
-        # Extract message ID from headers if available
-        message_id = response.headers.get('X-Message-Id', 'unknown')
+        # Log usage per recipient in one batch
+        log_usage_batch(db, [
+            {
+                "user_id": user_id,
+                "endpoint": "/api/email/send-bulk",
+                "cost": settings.cost_email_send,
+                "success": True
+            }
+            for _ in request.recipients
+        ])
+        
+        return EmailBulkSendResponse(
+            success=True,
+            message=f"Email sent to {len(request.recipients)} recipients",
+            recipients=len(request.recipients),
+            message_id=message_id
+        )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        # Log failed usage
+        log_usage(
+            db=db,
+            user_id=user_id,
+            endpoint="/api/email/send-bulk",
+            cost=0,  # Don't charge for failures
+            success=False,
+            error_message=str(e)
+        )
+        
+        raise HTTPException(
+            status_code=400 if isinstance(e, EmailRejected) else 500,
+            detail=f"Failed to send bulk email: {str(e)}"
+        )
+
+
+ATTACHMENTS_REQUEST_BODY = {
+    "required": True,
+    "content": {
+        "multipart/form-data": {
+            "schema": {
+                "type": "object",
+                "required": ["to", "subject", "body", "files"],
+                "properties": {
+                    "to": {"type": "string", "format": "email"},
+                    "subject": {"type": "string"},
+                    "body": {"type": "string"},
+                    "files": {
+                        "type": "array",
+                        "items": {"type": "string", "format": "binary"},
+                        "description": "Attachments"
+                    }
+                }
+            }
+        }
+    }
+}
+
+
+async def parse_attachments_form(http_request: Request) -> FormData:
+    """Parse the multipart body, enforcing attachment limits as it streams in"""
+    if not http_request.headers.get("content-type", "").startswith("multipart/form-data"):
+        raise HTTPException(status_code=415, detail="Expected multipart/form-data")
+    
+    parser = LimitedMultiPartParser(
+        http_request.headers,
+        http_request.stream(),
+        max_files=settings.email_attachments_max_count,
+        max_fields=3,
+        max_file_bytes=settings.email_attachment_max_bytes,
+        max_total_file_bytes=settings.email_attachments_max_total_bytes
+    )
+    try:
+        return await parser.parse()
+    except PartTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except MultiPartException as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post(
+    "/send-with-attachments",
+    response_model=EmailSendResponse,
+    openapi_extra={"requestBody": ATTACHMENTS_REQUEST_BODY}
+)
+async def send_email_with_attachments(
+    http_request: Request,
+    user_id: str = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Send an email with file attachments (multipart/form-data)
+    
+    Fields: `to`, `subject`, `body`, and one or more `files`. Attachments
+    are streamed to SendGrid, base64-encoded in chunks, without being held
+    in memory. Limits (EMAIL_ATTACHMENT_MAX_BYTES per file,
+    EMAIL_ATTACHMENTS_MAX_TOTAL_BYTES per message) are enforced while the
+    upload arrives, so an oversized request is refused before it is stored.
+    
+    Cost: $0.15 per email
+    """
+    form = await parse_attachments_form(http_request)
+    try:
+        return await send_attachments_form(form, user_id, db)
+    finally:
+        await form.close()
+
+
+async def send_attachments_form(form: FormData, user_id: str, db: Session) -> EmailSendResponse:
+    files = [f for f in form.getlist("files") if isinstance(f, StarletteUploadFile)]
+    if not files:
+        raise HTTPException(status_code=422, detail="At least one file is required in `files`")
+    
+    try:
+        request = EmailSendRequest(to=form.get("to"), subject=form.get("subject"), body=form.get("body"))
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+    
+    sizes = [upload_size(upload) for upload in files]
+    
+    try:
+        payload = build_mail_payload(
+            personalizations=[{"to": [{"email": request.to}]}],
+            subject=request.subject,
+            html_body=text_to_html(request.body)
+        )
+        content, content_length = attachment_stream(payload, files, sizes)
+        message_id = await sendgrid_send_stream(content, content_length)
+        record_sent_email(db, user_id, message_id)
         
         # Log successful usage
         log_usage(
             db=db,
             user_id=user_id,
-            endpoint="/api/email/send",
+            endpoint="/api/email/send-with-attachments",
             cost=settings.cost_email_send,
             success=True
         )
         
         return EmailSendResponse(
             success=True,
-            message="Email sent successfully",
+            message=f"Email sent with {len(files)} attachment(s)",
             message_id=message_id
         )
-        
+    
+    except HTTPException:
+        raise
     except Exception as e:
         # Log failed usage
         log_usage(
             db=db,
             user_id=user_id,
-            endpoint="/api/email/send",
+            endpoint="/api/email/send-with-attachments",
             cost=0,  # Don't charge for failures
             success=False,
             error_message=str(e)
         )
         
         raise HTTPException(
-            status_code=500,
+            status_code=400 if isinstance(e, EmailRejected) else 500,
             detail=f"Failed to send email: {str(e)}"
         )
+
+
+@router.get("/backends")
+async def get_email_backends(user_id: str = Depends(get_current_user)):
+    """
+    Health of the email delivery backends, in failover order (free)
+    """
+    return {
+        "backends": [
+            {
+                "name": backend.name,
+                "configured": backend.configured(),
+                "available": backend.health.available(),
+                "avg_latency_seconds": round(backend.health.latency, 3),
+                "error_rate": round(backend.health.error_rate, 3)
+            }
+            for backend in email_backends.backends
+        ]
+    }
+
+
+@router.get("/jobs/{job_id}", response_model=EmailJobResponse)
+async def get_email_job(
+    job_id: str,
+    user_id: str = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Get the delivery status of a queued email
+    
+    This endpoint is free.
+    """
+    job = db.query(EmailJob).filter(
+        EmailJob.job_id == job_id,
+        EmailJob.user_id == user_id
+    ).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Email job not found")
+    
+    return job_to_response(job)
+
+
+@router.post("/events", include_in_schema=False)
+async def receive_email_events(request: Request):
+    """
+    SendGrid event webhook
+    
+    Verifies the signed payload and queues its events for batched
+    insertion. Returns 503 when the buffer is full so SendGrid retries.
+    """
+    signature = request.headers.get(EventWebhookHeader.SIGNATURE)
+    timestamp = request.headers.get(EventWebhookHeader.TIMESTAMP)
+    if not signature or not timestamp:
+        raise HTTPException(status_code=401, detail="Missing webhook signature")
+    
+    payload = (await request.body()).decode("utf-8")
+    if not await asyncio.to_thread(verify_event_signature, payload, signature, timestamp):
+        raise HTTPException(status_code=403, detail="Invalid webhook signature")
+    
+    try:
+        events = json.loads(payload)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON payload")
+    if not isinstance(events, list):
+        raise HTTPException(status_code=400, detail="Expected a list of events")
+    
+    rows = [row for row in (event_to_row(e) for e in events if isinstance(e, dict)) if row]
+    
+    if rows:
+        try:
+            _event_queue.put_nowait(rows)
+        except asyncio.QueueFull:
+            raise HTTPException(status_code=503, detail="Event buffer full, retry later")
+    
+    return {"accepted": len(rows)}
+
+
+@router.get("/status/{message_id}", response_model=EmailStatusResponse)
+async def get_email_status(
+    message_id: str,
+    user_id: str = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Delivery and engagement events for a sent email
+    
+    `message_id` is the ID returned by /send (SendGrid deliveries only);
+    only the user who sent the message can read its events. Events arrive from SendGrid's event webhook, usually within seconds.
+    
+    This endpoint is free.
+    """
+    sent = db.query(SentEmail.id).filter(
+        SentEmail.message_id == message_id,
+        SentEmail.user_id == user_id
+    ).first()
+    if not sent:
+        raise HTTPException(status_code=404, detail="No events recorded for this message")
+    
+    events = db.query(EmailEvent).filter(
+        EmailEvent.message_id == message_id
+    ).order_by(EmailEvent.timestamp, EmailEvent.id).all()
+    if not events:
+        raise HTTPException(status_code=404, detail="No events recorded for this message")
+    
+    # SendGrid may redeliver a batch; keep the first copy of each event
+    seen = set()
+    unique_events = []
+    for event in events:
+        if event.sg_event_id:
+            if event.sg_event_id in seen:
+                continue
+            seen.add(event.sg_event_id)
+        unique_events.append(event)
+    
+    return EmailStatusResponse(
+        message_id=message_id,
+        status={event.email or "": event.event for event in unique_events},
+        events=[
+            EmailEventInfo(
+                event=event.event,
+                email=event.email,
+                timestamp=event.timestamp,
+                reason=event.reason,
+                url=event.url
+            )
+            for event in unique_events
+        ]
+    )
+
+
+@router.post("/templates", response_model=EmailTemplateInfo)
+async def save_email_template(
+    request: EmailTemplateRequest,
+    user_id: str = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Create or replace a named email template
+    
+    Use {{ name }} placeholders in the subject or body. Send it with
+    `template_id` + `variables` on /send or /send-bulk.
+    
+    This endpoint is free.
+    """
+    compiled = CompiledTemplate(request.subject, request.body)  # Validate before saving
+    
+    template = db.query(EmailTemplate).filter(
+        EmailTemplate.user_id == user_id,
+        EmailTemplate.name == request.name
+    ).first()
+    if template is None:
+        count = db.query(EmailTemplate).filter(EmailTemplate.user_id == user_id).count()
+        if count >= settings.email_template_max_per_user:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Template limit reached ({settings.email_template_max_per_user})"
+            )
+        template = EmailTemplate(user_id=user_id, name=request.name)
+        db.add(template)
+    
+    template.subject = request.subject
+    template.body = request.body
+    template.updated_at = datetime.utcnow()
+    db.commit()
+    db.refresh(template)
+    template_cache.set(template.id, (template.updated_at, compiled))
+    
+    return EmailTemplateInfo(
+        template_id=template.id,
+        name=template.name,
+        variables=compiled.variables,
+        updated_at=template.updated_at
+    )
+
+
+@router.get("/templates", response_model=EmailTemplateListResponse)
+async def list_email_templates(
+    user_id: str = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    List your email templates
+    
+    This endpoint is free.
+    """
+    templates = db.query(EmailTemplate).filter(EmailTemplate.user_id == user_id).all()
+    
+    return EmailTemplateListResponse(
+        success=True,
+        templates=[
+            EmailTemplateInfo(
+                template_id=t.id,
+                name=t.name,
+                variables=get_compiled_template(db, user_id, t.id).variables,
+                updated_at=t.updated_at
+            )
+            for t in templates
+        ]
+    )
+
+
+@router.delete("/templates/{template_id}")
+async def delete_email_template(
+    template_id: int,
+    user_id: str = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Delete an email template
+    
+    This endpoint is free.
+    """
+    deleted = db.query(EmailTemplate).filter(
+        EmailTemplate.id == template_id,
+        EmailTemplate.user_id == user_id
+    ).delete(synchronize_session=False)
+    db.commit()
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Email template not found")
+    
+    template_cache.pop(template_id)
+    return {"success": True, "message": "Template deleted"}
@@ -1,20 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from fastapi.responses import RedirectResponse
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, Field
+from typing import AsyncIterator, Awaitable, Callable, List, Literal, Optional, Tuple
+import asyncio
+import base64
 import httpx
-import secrets
+import time
 
 from app.auth import get_current_user
-from app.database import get_db, log_usage
+from app.cache import BlobCache, TTLCache
+from app.database import get_db, log_usage, create_oauth_state, consume_oauth_state
 from app.config import get_settings
+from app.http_clients import get_http_client
+from app.vault import get_credential, set_credential, delete_credential
+from app.streaming import base64_json_body, spool_body
 
 router = APIRouter(prefix="/api/github", tags=["GitHub"])
 settings = get_settings()
 
-# In-memory state storage (TODO: move to Redis/DB for production)
-oauth_states = {}
-user_tokens = {}
+# Last known blob SHA (and contents ETag) per (user, repo, branch, path)
+content_sha_cache = TTLCache(maxsize=settings.github_sha_cache_size)
+
+# Blob contents keyed by git SHA (immutable, so never invalidated)
+blob_cache = BlobCache(
+    settings.github_blob_cache_dir,
+    memory_bytes=settings.github_blob_cache_memory_bytes,
+    disk_bytes=settings.github_blob_cache_disk_bytes
+)
+
+# Last response + ETag for directory and tree reads; revalidated every time
+# since branch names move, but a 304 is free
+listing_cache = TTLCache(maxsize=1024)
 
 
 # Request/Response Models
@@ -49,9 +66,86 @@ class PushFileResponse(BaseModel):
     message: str
 
 
+class GitHubFileContent(BaseModel):
+    path: str
+    sha: str
+    size: int
+    encoding: str  # "utf-8", or "base64" for binary files
+    content: str
+
+
+class GitHubDirectoryEntry(BaseModel):
+    name: str
+    path: str
+    type: str  # file, dir, symlink, submodule
+    sha: str
+    size: int = 0
+
+
+class GitHubDirectoryResponse(BaseModel):
+    repo: str
+    path: str
+    ref: str
+    entries: List[GitHubDirectoryEntry]
+
+
+class GitHubTreeEntry(BaseModel):
+    path: str
+    type: str  # blob, tree, commit
+    mode: str
+    sha: str
+    size: Optional[int] = None
+    encoding: Optional[str] = None
+    content: Optional[str] = None
+
+
+class GitHubTreeResponse(BaseModel):
+    repo: str
+    ref: str
+    sha: str
+    truncated: bool
+    entries: List[GitHubTreeEntry]
+
+
+class PushFilesEntry(BaseModel):
+    path: str = Field(..., min_length=1, description="File path in repo")
+    content: str = Field(..., max_length=1000000)
+    encoding: Literal["utf-8", "base64"] = Field(default="utf-8", description="Use base64 for binary files")
+
+
+class PushFilesRequest(BaseModel):
+    repo: str = Field(..., description="Format: owner/repo")
+    files: List[PushFilesEntry] = Field(..., min_length=1)
+    message: str = Field(default="Update via Agent API Proxy")
+    branch: str = Field(default="main")
+
+
+class PushFilesResponse(BaseModel):
+    success: bool
+    commit_sha: str
+    files: int
+    message: str
+
+
+class BootstrapRepoRequest(CreateRepoRequest):
+    files: List[PushFilesEntry] = Field(..., min_length=1)
+    message: str = Field(default="Initial commit")
+
+
+class BootstrapRepoResponse(BaseModel):
+    success: bool
+    repo_url: str
+    full_name: str
+    branch: str
+    commit_sha: str
+    files: int
+    message: str
+
+
 @router.get("/authorize", response_model=GitHubAuthResponse)
 async def github_authorize(
     user_id: str = Depends(get_current_user),
+    db: Session = Depends(get_db)
 ):
     """
     Start GitHub OAuth flow
@@ -64,9 +158,8 @@ async def github_authorize(
             detail="GitHub OAuth not configured on server"
         )
     
-    # Generate state for CSRF protection
-    state = secrets.token_urlsafe(32)
-    oauth_states[state] = user_id
+    # Generate state for CSRF protection (stored in the DB, expires)
+    state = create_oauth_state(db, "github", user_id)
     
     auth_url = (
         f"https://github.com/login/oauth/authorize"
@@ -90,11 +183,10 @@ async def github_callback(
     
     Exchanges code for access token and stores it.
     """
-    # Verify state
-    if state not in oauth_states:
-        raise HTTPException(status_code=400, detail="Invalid state parameter")
-    
-    user_id = oauth_states.pop(state)
+    # Verify state (single use, any worker)
+    user_id = consume_oauth_state(db, "github", state)
+    if user_id is None:
+        raise HTTPException(status_code=400, detail="Invalid or expired state parameter")
     
     # Exchange code for access token
     async with httpx.AsyncClient() as client:
@@ -123,8 +215,8 @@ async def github_callback(
                 detail="No access token in response"
             )
     
-    # Store token (TODO: encrypt and store in DB)
-    user_tokens[user_id] = access_token
+    # Store token (encrypted, visible to all workers)
+    set_credential(user_id, "github", {"token": access_token})
     
     return RedirectResponse(
         url=f"{settings.frontend_url}/github-connected",
@@ -132,20 +224,462 @@ async def github_callback(
     )
 
 
+@router.delete("/disconnect")
+async def disconnect_github(
+    user_id: str = Depends(get_current_user),
+):
+    """
+    Disconnect GitHub: revoke the stored OAuth token and forget it
+    
+    This endpoint is free.
+    """
+    credential = get_credential(user_id, "github")
+    if not credential:
+        raise HTTPException(status_code=404, detail="GitHub not connected")
+    
+    # Best effort; the token is forgotten here even if GitHub can't be reached
+    if settings.github_client_id and settings.github_client_secret:
+        try:
+            await get_github_client().request(
+                "DELETE", f"/applications/{settings.github_client_id}/token",
+                auth=(settings.github_client_id, settings.github_client_secret),
+                headers={"Accept": "application/vnd.github+json"},
+                json={"access_token": credential["token"]}
+            )
+        except httpx.HTTPError as e:
+            print(f"❌ GitHub token revocation failed: {e}")
+    
+    delete_credential(user_id, "github")
+    return {"success": True, "message": "GitHub disconnected"}
+
+
 def get_user_token(user_id: str) -> str:
     """Get stored GitHub token for user"""
-    token = user_tokens.get(user_id)
-    if not token:
+    credential = get_credential(user_id, "github")
+    if not credential:
         raise HTTPException(
             status_code=401,
             detail="GitHub not connected. Call /api/github/authorize first."
         )
-    return token
+    return credential["token"]
+
+
+def get_github_client() -> httpx.AsyncClient:
+    """Get the pooled HTTP client for the GitHub REST API"""
+    return get_http_client(
+        "github",
+        base_url="https://api.github.com",
+        timeout=30.0,
+        limits=httpx.Limits(max_connections=settings.github_max_connections)
+    )
+
+
+def github_headers(token: str) -> dict:
+    return {
+        "Authorization": f"Bearer {token}",
+        "Accept": "application/vnd.github+json",
+        "X-GitHub-Api-Version": "2022-11-28"
+    }
+
+
+# Rate limits
+# GitHub quota is per token. Every API call goes through github_request,
+# which records the X-RateLimit-* headers, paces calls once a token is
+# nearly exhausted and waits out secondary rate limits (or answers 429)
+# instead of sending requests that will only come back 403.
+
+class TokenQuota:
+    """Last known GitHub quota for one token"""
+    
+    def __init__(self):
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.reset = 0.0  # Epoch seconds
+        self.blocked_until = 0.0  # Epoch seconds; set by secondary/exhausted limits
+        self.next_slot = 0.0  # Epoch seconds the next paced call may start
+
+
+token_quotas = TTLCache(maxsize=settings.github_token_quota_size)
+
+
+def get_token_quota(token: str) -> TokenQuota:
+    quota = token_quotas.get(token)
+    if quota is None:
+        quota = TokenQuota()
+        token_quotas.set(token, quota)
+    return quota
+
+
+def rate_limited(retry_after: float) -> HTTPException:
+    retry_after = max(1, int(retry_after) + 1)
+    return HTTPException(
+        status_code=429,
+        detail=f"GitHub rate limit reached for this token. Retry in {retry_after}s.",
+        headers={"Retry-After": str(retry_after)}
+    )
+
+
+async def wait_for_quota(quota: TokenQuota):
+    """
+    Hold a call until the token may be used, or raise 429 if that's too long
+    
+    Each call reserves the next send slot up front and sleeps until it, so
+    the max-wait check covers time spent queued behind earlier calls.
+    """
+    now = time.time()
+    start = now
+    interval = 0.0
+    if quota.blocked_until > now:
+        start = quota.blocked_until
+    elif quota.remaining is not None and quota.reset > now:
+        if quota.remaining <= 0:
+            start = quota.reset
+        elif quota.remaining <= settings.github_rate_limit_reserve:
+            # Spread what's left over the rest of the window, clamped so the
+            # reserve slows calls down rather than refusing them outright
+            interval = min(
+                (quota.reset - now) / quota.remaining,
+                settings.github_rate_limit_max_interval
+            )
+    
+    slot = max(start, quota.next_slot)
+    if slot - now > settings.github_rate_limit_max_wait:
+        raise rate_limited(slot - now)
+    quota.next_slot = slot + interval
+    if quota.remaining is not None:
+        quota.remaining -= 1  # Count in-flight calls before the headers arrive
+    
+    if slot > now:
+        await asyncio.sleep(slot - now)
+
+
+def record_quota(quota: TokenQuota, response: httpx.Response) -> bool:
+    """Update quota from a response; returns True if it was rate limited"""
+    headers = response.headers
+    if "X-RateLimit-Remaining" in headers:
+        quota.limit = int(headers.get("X-RateLimit-Limit", 0)) or quota.limit
+        quota.remaining = int(headers["X-RateLimit-Remaining"])
+        quota.reset = float(headers.get("X-RateLimit-Reset", 0))
+    
+    if response.status_code not in (403, 429):
+        return False
+    
+    now = time.time()
+    if headers.get("Retry-After"):
+        quota.blocked_until = now + float(headers["Retry-After"])
+    elif headers.get("X-RateLimit-Remaining") == "0":
+        quota.blocked_until = quota.reset
+    elif "rate limit" in response.text.lower():
+        # Secondary limit without Retry-After: GitHub asks for at least a minute
+        quota.blocked_until = now + 60
+    else:
+        return False  # A permission error, not a rate limit
+    return True
+
+
+async def github_request(token: str, method: str, url: str,
+                         stream: Callable[[], AsyncIterator[bytes]] = None, **kwargs) -> httpx.Response:
+    """
+    Make a GitHub API call within the token's rate limits
+    
+    `stream` supplies a streamed request body; it is called once per attempt.
+    """
+    client = get_github_client()
+    quota = get_token_quota(token)
+    headers = {**github_headers(token), **kwargs.pop("headers", {})}
+    
+    for _ in range(2):
+        await wait_for_quota(quota)
+        if stream:
+            kwargs["content"] = stream()
+        response = await client.request(method, url, headers=headers, **kwargs)
+        if not record_quota(quota, response):
+            return response
+    
+    raise rate_limited(quota.blocked_until - time.time())
+
+
+def set_quota_headers(response: Response, token: str):
+    """Expose the token's remaining GitHub quota to the caller"""
+    quota = token_quotas.get(token)
+    if quota is None or quota.remaining is None:
+        return
+    response.headers["X-GitHub-RateLimit-Limit"] = str(quota.limit)
+    response.headers["X-GitHub-RateLimit-Remaining"] = str(max(quota.remaining, 0))
+    response.headers["X-GitHub-RateLimit-Reset"] = str(int(quota.reset))
+
+
+def check_github_response(response: httpx.Response, *expected: int) -> dict:
+    """Raise GitHub's status and error text unless the status is expected"""
+    if response.status_code not in expected:
+        raise HTTPException(
+            status_code=response.status_code,
+            detail=f"GitHub API error: {response.text}"
+        )
+    return response.json()
+
+
+async def lookup_content_sha(token: str, key: tuple, refresh: bool = False) -> Optional[str]:
+    """
+    Current SHA of a file, or None if it doesn't exist
+    
+    A recently confirmed SHA is used without asking GitHub. Otherwise the
+    lookup is conditional on the cached ETag; a 304 doesn't count against
+    the rate limit. `refresh` forces a full lookup.
+    """
+    _, repo, branch, path = key
+    cached = None if refresh else content_sha_cache.get(key)
+    if cached and time.monotonic() - cached["checked_at"] < settings.github_sha_fresh_seconds:
+        return cached["sha"]
+    
+    request_headers = {}
+    if cached and cached["etag"]:
+        request_headers["If-None-Match"] = cached["etag"]
+    
+    response = await github_request(
+        token, "GET", f"/repos/{repo}/contents/{path}",
+        headers=request_headers,
+        params={"ref": branch}
+    )
+    
+    if response.status_code == 304:
+        content_sha_cache.set(key, {**cached, "checked_at": time.monotonic()})
+        return cached["sha"]
+    
+    if response.status_code == 200:
+        sha = response.json()["sha"]
+        content_sha_cache.set(key, {
+            "sha": sha,
+            "etag": response.headers.get("ETag"),
+            "checked_at": time.monotonic()
+        })
+        return sha
+    
+    content_sha_cache.pop(key)
+    return None
+
+
+async def put_contents(token: str, key: tuple,
+                       put: Callable[[Optional[str]], Awaitable[httpx.Response]]) -> dict:
+    """
+    Create or update a file with the contents API
+    
+    `put(sha)` sends the PUT for the file's current SHA (None for a new
+    file). If GitHub rejects the SHA as stale it is looked up fresh and the
+    PUT retried once. Returns GitHub's response and caches the new SHA.
+    """
+    # Current file SHA if it exists (needed for updates), usually cached
+    put_response = await put(await lookup_content_sha(token, key))
+    
+    if put_response.status_code in (409, 422):
+        # Our SHA was stale (the file changed elsewhere): look it up and retry once
+        put_response = await put(await lookup_content_sha(token, key, refresh=True))
+    
+    commit_data = check_github_response(put_response, 200, 201)
+    
+    # The new blob SHA is what the next update of this file needs
+    content_sha_cache.set(key, {
+        "sha": commit_data["content"]["sha"],
+        "etag": None,
+        "checked_at": time.monotonic()
+    })
+    return commit_data
+
+
+def is_non_fast_forward(response: httpx.Response) -> bool:
+    """Whether a ref update was refused because the branch moved"""
+    try:
+        message = response.json().get("message", "")
+    except ValueError:
+        return False
+    return "fast forward" in message.lower()
+
+
+async def commit_to_branch(token: str, repo: str, branch: str, message: str,
+                           tree_entries: List[dict]) -> str:
+    """
+    Commit tree entries on top of a branch and fast-forward it
+    
+    Returns the new commit SHA. Raises 409 if the branch moved meanwhile.
+    """
+    # Current head commit and its tree
+    branch_response = await github_request(token, "GET", f"/repos/{repo}/branches/{branch}")
+    branch_data = check_github_response(branch_response, 200)
+    head_sha = branch_data["commit"]["sha"]
+    base_tree_sha = branch_data["commit"]["commit"]["tree"]["sha"]
+    
+    tree_response = await github_request(
+        token, "POST", f"/repos/{repo}/git/trees",
+        json={"base_tree": base_tree_sha, "tree": tree_entries}
+    )
+    tree_sha = check_github_response(tree_response, 201)["sha"]
+    
+    commit_response = await github_request(
+        token, "POST", f"/repos/{repo}/git/commits",
+        json={"message": message, "tree": tree_sha, "parents": [head_sha]}
+    )
+    commit_sha = check_github_response(commit_response, 201)["sha"]
+    
+    # Fast-forward only; GitHub answers 422 if the branch moved
+    ref_response = await github_request(
+        token, "PATCH", f"/repos/{repo}/git/refs/heads/{branch}",
+        json={"sha": commit_sha, "force": False}
+    )
+    if ref_response.status_code == 422 and is_non_fast_forward(ref_response):
+        raise HTTPException(
+            status_code=409,
+            detail=f"Branch '{branch}' was updated during the push; retry"
+        )
+    check_github_response(ref_response, 200)
+    return commit_sha
+
+
+async def wait_for_repo_ready(token: str, repo: str, branch: str):
+    """Poll until a just-created repo's default branch exists"""
+    deadline = time.monotonic() + settings.github_bootstrap_ready_timeout
+    delay = 0.25
+    while True:
+        response = await github_request(token, "GET", f"/repos/{repo}/git/ref/heads/{branch}")
+        if response.status_code == 200:
+            return
+        if response.status_code not in (404, 409) or time.monotonic() + delay > deadline:
+            raise Exception(f"Repository not ready ({response.status_code}): {response.text}")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 2.0)
+
+
+async def create_tree_entries(token: str, repo: str, files: List[PushFilesEntry]) -> List[dict]:
+    """
+    Build tree entries for a commit
+    
+    Small text files are inlined in the tree request (GitHub creates the
+    blob); the rest are uploaded as blobs concurrently.
+    """
+    slots = asyncio.Semaphore(settings.github_blob_concurrency)
+    
+    async def entry(file: PushFilesEntry) -> dict:
+        tree_entry = {"path": file.path, "mode": "100644", "type": "blob"}
+        if file.encoding == "utf-8" and len(file.content.encode('utf-8')) <= settings.github_inline_blob_bytes:
+            tree_entry["content"] = file.content
+            return tree_entry
+        
+        async with slots:
+            response = await github_request(
+                token, "POST", f"/repos/{repo}/git/blobs",
+                json={"content": file.content, "encoding": file.encoding}
+            )
+        tree_entry["sha"] = check_github_response(response, 201)["sha"]
+        return tree_entry
+    
+    return await asyncio.gather(*(entry(file) for file in files))
+
+
+async def cached_github_get(token: str, cache_key: tuple, url: str, params: dict = None):
+    """GET a JSON resource, revalidating a cached copy with If-None-Match"""
+    cached = listing_cache.get(cache_key)
+    request_headers = {}
+    if cached:
+        request_headers["If-None-Match"] = cached["etag"]
+    
+    response = await github_request(token, "GET", url, headers=request_headers, params=params)
+    if response.status_code == 304:
+        return cached["data"]
+    
+    data = check_github_response(response, 200)
+    if response.headers.get("ETag"):
+        listing_cache.set(cache_key, {"etag": response.headers["ETag"], "data": data})
+    return data
+
+
+async def get_blob(token: str, repo: str, sha: str) -> bytes:
+    """Blob contents by SHA, from the local cache when possible"""
+    data = await asyncio.to_thread(blob_cache.get, sha)
+    if data is not None:
+        return data
+    
+    response = await github_request(
+        token, "GET", f"/repos/{repo}/git/blobs/{sha}",
+        headers={"Accept": "application/vnd.github.raw+json"}
+    )
+    if response.status_code != 200:
+        check_github_response(response, 200)
+    
+    await asyncio.to_thread(blob_cache.put, sha, response.content)
+    return response.content
+
+
+def decode_blob(data: bytes) -> Tuple[str, str]:
+    """(encoding, content) for a blob; text as UTF-8, anything else base64"""
+    try:
+        return "utf-8", data.decode('utf-8')
+    except UnicodeDecodeError:
+        return "base64", base64.b64encode(data).decode('utf-8')
+
+
+# The contents API lists at most this many entries per directory
+CONTENTS_LISTING_LIMIT = 1000
+
+
+async def list_directory(token: str, user_id: str, repo: str, path: str,
+                         ref: str) -> List[GitHubDirectoryEntry]:
+    data = await cached_github_get(
+        token, ("contents", user_id, repo, ref, path),
+        f"/repos/{repo}/contents/{path}", params={"ref": ref}
+    )
+    if not isinstance(data, list):
+        raise HTTPException(status_code=400, detail=f"Not a directory: {path}")
+    
+    return [
+        GitHubDirectoryEntry(
+            name=item["name"],
+            path=item["path"],
+            type=item["type"],
+            sha=item["sha"],
+            size=item.get("size") or 0
+        )
+        for item in data
+    ]
+
+
+async def get_path_entry(token: str, user_id: str, repo: str, path: str,
+                         ref: str) -> Optional[GitHubDirectoryEntry]:
+    """Look up one path directly (None if it doesn't exist)"""
+    try:
+        data = await cached_github_get(
+            token, ("contents", user_id, repo, ref, path),
+            f"/repos/{repo}/contents/{path}", params={"ref": ref}
+        )
+    except HTTPException as e:
+        if e.status_code == 404:
+            return None
+        raise
+    if isinstance(data, list):
+        raise HTTPException(status_code=400, detail=f"Not a file: {path} (dir)")
+    
+    return GitHubDirectoryEntry(
+        name=data["name"],
+        path=data["path"],
+        type=data["type"],
+        sha=data["sha"],
+        size=data.get("size") or 0
+    )
+
+
+def log_read(db: Session, user_id: str, endpoint: str, error: Exception = None):
+    log_usage(
+        db=db,
+        user_id=user_id,
+        endpoint=endpoint,
+        cost=0 if error else settings.cost_github_read,  # Don't charge for failures
+        success=error is None,
+        error_message=str(error) if error else None
+    )
 
 
 @router.post("/create-repo", response_model=CreateRepoResponse)
 async def create_repo(
     request: CreateRepoRequest,
+    response: Response,
     user_id: str = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -157,29 +691,24 @@ async def create_repo(
     try:
         token = get_user_token(user_id)
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "https://api.github.com/user/repos",
-                headers={
-                    "Authorization": f"Bearer {token}",
-                    "Accept": "application/vnd.github+json",
-                    "X-GitHub-Api-Version": "2022-11-28"
-                },
-                json={
-                    "name": request.name,
-                    "description": request.description,
-                    "private": request.private
-                }
+        github_response = await github_request(
+            token, "POST", "/user/repos",
+            json={
+                "name": request.name,
+                "description": request.description,
+                "private": request.private
+            }
+        )
+        
+        if github_response.status_code != 201:
+            raise HTTPException(
+                status_code=github_response.status_code,
+                detail=f"GitHub API error: {github_response.text}"
             )
-            
-            if response.status_code != 201:
-                raise HTTPException(
-                    status_code=response.status_code,
-                    detail=f"GitHub API error: {response.text}"
-                )
-            
-            repo_data = response.json()
-            repo_url = repo_data["html_url"]
+        
+        repo_data = github_response.json()
+        repo_url = repo_data["html_url"]
+        set_quota_headers(response, token)
         
         # Log successful usage
         log_usage(
@@ -218,6 +747,7 @@ async def create_repo(
 @router.post("/push-file", response_model=PushFileResponse)
 async def push_file(
     request: PushFileRequest,
+    response: Response,
     user_id: str = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -228,25 +758,13 @@ async def push_file(
     """
     try:
         token = get_user_token(user_id)
+        key = (user_id, request.repo, request.branch, request.path)
         
-        # Get current file SHA if it exists (needed for updates)
-        async with httpx.AsyncClient() as client:
-            # Check if file exists
-            get_response = await client.get(
-                f"https://api.github.com/repos/{request.repo}/contents/{request.path}",
-                headers={
-                    "Authorization": f"Bearer {token}",
-                    "Accept": "application/vnd.github+json",
-                    "X-GitHub-Api-Version": "2022-11-28"
-                },
-                params={"ref": request.branch}
-            )
-            
-            # Prepare request data
-            import base64
-            content_bytes = request.content.encode('utf-8')
-            content_b64 = base64.b64encode(content_bytes).decode('utf-8')
-            
+        # Prepare request data
+        content_bytes = request.content.encode('utf-8')
+        content_b64 = base64.b64encode(content_bytes).decode('utf-8')
+        
+        async def put_file(sha: Optional[str]) -> httpx.Response:
             data = {
                 "message": request.message,
                 "content": content_b64,
@@ -254,29 +772,17 @@ async def push_file(
             }
             
             # If file exists, include SHA for update
-            if get_response.status_code == 200:
-                file_data = get_response.json()
-                data["sha"] = file_data["sha"]
+            if sha:
+                data["sha"] = sha
             
-            # Push file
-            put_response = await client.put(
-                f"https://api.github.com/repos/{request.repo}/contents/{request.path}",
-                headers={
-                    "Authorization": f"Bearer {token}",
-                    "Accept": "application/vnd.github+json",
-                    "X-GitHub-Api-Version": "2022-11-28"
-                },
+            return await github_request(
+                token, "PUT", f"/repos/{request.repo}/contents/{request.path}",
                 json=data
             )
-            
-            if put_response.status_code not in [200, 201]:
-                raise HTTPException(
-                    status_code=put_response.status_code,
-                    detail=f"GitHub API error: {put_response.text}"
-                )
-            
-            commit_data = put_response.json()
-            commit_sha = commit_data["commit"]["sha"]
+        
+        commit_data = await put_contents(token, key, put_file)
+        commit_sha = commit_data["commit"]["sha"]
+        set_quota_headers(response, token)
         
         # Log successful usage
         log_usage(
@@ -310,3 +816,462 @@ async def push_file(
             status_code=500,
             detail=f"Failed to push file: {str(e)}"
         )
+
+
+@router.post("/push-file/raw", response_model=PushFileResponse)
+async def push_file_raw(
+    request: Request,
+    response: Response,
+    repo: str = Query(..., description="Format: owner/repo"),
+    path: str = Query(..., min_length=1, description="File path in repo"),
+    message: str = Query(default="Update via Agent API Proxy"),
+    branch: str = Query(default="main"),
+    user_id: str = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Push a file (text or binary) sent as the raw request body
+    
+    The body is spooled to a temp file and base64-encoded in chunks
+    straight into the outbound request, so memory per upload stays small.
+    Files up to GITHUB_CONTENTS_MAX_BYTES use the contents API; larger
+    ones (up to 100MB) are uploaded as a blob and committed via the Git
+    Data API.
+    
+    Cost: $0.05 per file push
+    """
+    path = path.strip("/")
+    token = get_user_token(user_id)
+    
+    try:
+        upload = await spool_body(request.stream(), settings.github_raw_upload_max_bytes)
+    except ValueError:
+        raise HTTPException(status_code=413, detail=f"File too large (max {settings.github_raw_upload_max_bytes} bytes)")
+    
+    try:
+        key = (user_id, repo, branch, path)
+        
+        if upload.size <= settings.github_contents_max_bytes:
+            async def put_file(sha: Optional[str]) -> httpx.Response:
+                fields = {"message": message, "branch": branch}
+                if sha:
+                    fields["sha"] = sha
+                body, length = base64_json_body(fields, "content", upload, upload.size)
+                return await github_request(
+                    token, "PUT", f"/repos/{repo}/contents/{path}",
+                    stream=body,
+                    headers={"Content-Type": "application/json", "Content-Length": str(length)}
+                )
+            
+            commit_sha = (await put_contents(token, key, put_file))["commit"]["sha"]
+        else:
+            body, length = base64_json_body({"encoding": "base64"}, "content", upload, upload.size)
+            blob_response = await github_request(
+                token, "POST", f"/repos/{repo}/git/blobs",
+                stream=body,
+                headers={"Content-Type": "application/json", "Content-Length": str(length)}
+            )
+            blob_sha = check_github_response(blob_response, 201)["sha"]
+            
+            commit_sha = await commit_to_branch(token, repo, branch, message, [
+                {"path": path, "mode": "100644", "type": "blob", "sha": blob_sha}
+            ])
+            content_sha_cache.set(key, {"sha": blob_sha, "etag": None, "checked_at": time.monotonic()})
+        
+        set_quota_headers(response, token)
+        
+        # Log successful usage
+        log_usage(
+            db=db,
+            user_id=user_id,
+            endpoint="/api/github/push-file/raw",
+            cost=settings.cost_github_push_file,
+            success=True
+        )
+        
+        return PushFileResponse(
+            success=True,
+            commit_sha=commit_sha,
+            message=f"File pushed successfully ({upload.size} bytes)"
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        # Log failed usage
+        log_usage(
+            db=db,
+            user_id=user_id,
+            endpoint="/api/github/push-file/raw",
+            cost=0,
+            success=False,
+            error_message=str(e)
+        )
+        
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to push file: {str(e)}"
+        )
+    finally:
+        await upload.close()
+
+
+@router.post("/push-files", response_model=PushFilesResponse)
+async def push_files(
+    request: PushFilesRequest,
+    response: Response,
+    user_id: str = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Push several files to a GitHub repository as a single commit
+    
+    Uses the Git Data API: blobs are created concurrently, then one tree
+    and one commit, and the branch is fast-forwarded to it. If the branch
+    moved in the meantime, nothing is changed and 409 is returned.
+    
+    Cost: $0.10 per push, regardless of file count
+    """
+    if len(request.files) > settings.github_push_max_files:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many files (max {settings.github_push_max_files})"
+        )
+    
+    paths = [file.path for file in request.files]
+    if len(set(paths)) != len(paths):
+        raise HTTPException(status_code=400, detail="Duplicate file paths")
+    
+    try:
+        token = get_user_token(user_id)
+        
+        tree_entries = await create_tree_entries(token, request.repo, request.files)
+        commit_sha = await commit_to_branch(
+            token, request.repo, request.branch, request.message, tree_entries
+        )
+        set_quota_headers(response, token)
+        
+        # Log successful usage (billed once for the whole commit)
+        log_usage(
+            db=db,
+            user_id=user_id,
+            endpoint="/api/github/push-files",
+            cost=settings.cost_github_push_files,
+            success=True
+        )
+        
+        return PushFilesResponse(
+            success=True,
+            commit_sha=commit_sha,
+            files=len(request.files),
+            message=f"Pushed {len(request.files)} files in one commit"
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        # Log failed usage
+        log_usage(
+            db=db,
+            user_id=user_id,
+            endpoint="/api/github/push-files",
+            cost=0,
+            success=False,
+            error_message=str(e)
+        )
+        
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to push files: {str(e)}"
+        )
+
+
+@router.get("/contents", response_model=GitHubFileContent)
+async def get_file_contents(
+    response: Response,
+    repo: str = Query(..., description="Format: owner/repo"),
+    path: str = Query(..., min_length=1, description="File path in repo"),
+    ref: str = Query(default="main", description="Branch, tag or commit SHA"),
+    user_id: str = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Read a file from a GitHub repository
+    
+    The file's SHA is resolved from its (ETag-revalidated) parent directory
+    listing, or from the file's own metadata when that listing is truncated
+    at 1,000 entries, and the content is served from the local blob cache when that
+    SHA has been seen before. Binary files are returned base64-encoded.
+    
+    Cost: $0.02 per read
+    """
+    path = path.strip("/")
+    parent, _, _ = path.rpartition("/")
+    
+    try:
+        token = get_user_token(user_id)
+        entries = await list_directory(token, user_id, repo, parent, ref)
+        entry = next((e for e in entries if e.path == path), None)
+        if entry is None and len(entries) >= CONTENTS_LISTING_LIMIT:
+            # The listing was truncated; ask for the file itself
+            entry = await get_path_entry(token, user_id, repo, path, ref)
+        if entry is None:
+            raise HTTPException(status_code=404, detail=f"File not found: {path}")
+        if entry.type != "file":
+            raise HTTPException(status_code=400, detail=f"Not a file: {path} ({entry.type})")
+        
+        data = await get_blob(token, repo, entry.sha)
+        encoding, content = decode_blob(data)
+        set_quota_headers(response, token)
+        
+        log_read(db, user_id, "/api/github/contents")
+        
+        return GitHubFileContent(
+            path=path,
+            sha=entry.sha,
+            size=len(data),
+            encoding=encoding,
+            content=content
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        log_read(db, user_id, "/api/github/contents", error=e)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to read file: {str(e)}"
+        )
+
+
+@router.get("/directory", response_model=GitHubDirectoryResponse)
+async def get_directory(
+    response: Response,
+    repo: str = Query(..., description="Format: owner/repo"),
+    path: str = Query(default="", description="Directory path (empty for root)"),
+    ref: str = Query(default="main", description="Branch, tag or commit SHA"),
+    user_id: str = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    List a directory in a GitHub repository
+    
+    Cost: $0.02 per read
+    """
+    path = path.strip("/")
+    
+    try:
+        token = get_user_token(user_id)
+        entries = await list_directory(token, user_id, repo, path, ref)
+        set_quota_headers(response, token)
+        
+        log_read(db, user_id, "/api/github/directory")
+        
+        return GitHubDirectoryResponse(repo=repo, path=path, ref=ref, entries=entries)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        log_read(db, user_id, "/api/github/directory", error=e)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to list directory: {str(e)}"
+        )
+
+
+@router.get("/tree", response_model=GitHubTreeResponse)
+async def get_tree(
+    response: Response,
+    repo: str = Query(..., description="Format: owner/repo"),
+    ref: str = Query(default="main", description="Branch, tag or commit SHA"),
+    path_prefix: str = Query(default="", description="Only include paths under this prefix"),
+    include_content: bool = Query(default=False, description="Include file contents"),
+    user_id: str = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Recursive file tree of a GitHub repository
+    
+    With `include_content`, file contents are included (up to
+    GITHUB_TREE_CONTENT_MAX_FILES files). Only blobs missing from the local
+    cache are downloaded, so re-reading a mostly unchanged repository is
+    cheap.
+    
+    Cost: $0.02 per read
+    """
+    prefix = path_prefix.strip("/")
+    
+    try:
+        token = get_user_token(user_id)
+        
+        data = await cached_github_get(
+            token, ("tree", user_id, repo, ref),
+            f"/repos/{repo}/git/trees/{ref}", params={"recursive": "1"}
+        )
+        
+        entries = [
+            GitHubTreeEntry(
+                path=item["path"],
+                type=item["type"],
+                mode=item["mode"],
+                sha=item["sha"],
+                size=item.get("size")
+            )
+            for item in data["tree"]
+            if not prefix or item["path"] == prefix or item["path"].startswith(prefix + "/")
+        ]
+        
+        if include_content:
+            blobs = [entry for entry in entries if entry.type == "blob"]
+            if len(blobs) > settings.github_tree_content_max_files:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Too many files for include_content (max {settings.github_tree_content_max_files}); narrow path_prefix"
+                )
+            
+            slots = asyncio.Semaphore(settings.github_blob_concurrency)
+            
+            async def fill(entry: GitHubTreeEntry):
+                async with slots:
+                    blob = await get_blob(token, repo, entry.sha)
+                entry.encoding, entry.content = decode_blob(blob)
+            
+            await asyncio.gather(*(fill(entry) for entry in blobs))
+        
+        set_quota_headers(response, token)
+        log_read(db, user_id, "/api/github/tree")
+        
+        return GitHubTreeResponse(
+            repo=repo,
+            ref=ref,
+            sha=data["sha"],
+            truncated=data.get("truncated", False),
+            entries=entries
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        log_read(db, user_id, "/api/github/tree", error=e)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to read tree: {str(e)}"
+        )
+
+
+@router.post("/bootstrap", response_model=BootstrapRepoResponse)
+async def bootstrap_repo(
+    request: BootstrapRepoRequest,
+    response: Response,
+    user_id: str = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Create a repository and write its initial files in one call
+    
+    The repo is created (auto-initialized so the Git Data API can be used),
+    then the files become its first and only commit: blobs are created
+    concurrently, then one tree and one root commit replace the
+    auto-generated one on the default branch.
+    
+    Cost: $0.15 per bootstrap, regardless of file count
+    """
+    if len(request.files) > settings.github_push_max_files:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many files (max {settings.github_push_max_files})"
+        )
+    
+    paths = [file.path for file in request.files]
+    if len(set(paths)) != len(paths):
+        raise HTTPException(status_code=400, detail="Duplicate file paths")
+    
+    repo_url = None
+    try:
+        token = get_user_token(user_id)
+        
+        create_response = await github_request(
+            token, "POST", "/user/repos",
+            json={
+                "name": request.name,
+                "description": request.description,
+                "private": request.private,
+                "auto_init": True
+            }
+        )
+        repo_data = check_github_response(create_response, 201)
+        repo_url = repo_data["html_url"]
+        repo = repo_data["full_name"]
+        branch = repo_data.get("default_branch") or "main"
+        
+        await wait_for_repo_ready(token, repo, branch)
+        
+        tree_entries = await create_tree_entries(token, repo, request.files)
+        
+        # No base_tree and no parents: the commit holds exactly our files
+        tree_response = await github_request(
+            token, "POST", f"/repos/{repo}/git/trees",
+            json={"tree": tree_entries}
+        )
+        tree_sha = check_github_response(tree_response, 201)["sha"]
+        
+        commit_response = await github_request(
+            token, "POST", f"/repos/{repo}/git/commits",
+            json={"message": request.message, "tree": tree_sha, "parents": []}
+        )
+        commit_sha = check_github_response(commit_response, 201)["sha"]
+        
+        # Replace the auto-init commit (nothing else can be on the branch yet)
+        ref_response = await github_request(
+            token, "PATCH", f"/repos/{repo}/git/refs/heads/{branch}",
+            json={"sha": commit_sha, "force": True}
+        )
+        check_github_response(ref_response, 200)
+        set_quota_headers(response, token)
+        
+        # Log successful usage (billed once for repo + initial commit)
+        log_usage(
+            db=db,
+            user_id=user_id,
+            endpoint="/api/github/bootstrap",
+            cost=settings.cost_github_bootstrap,
+            success=True
+        )
+        
+        return BootstrapRepoResponse(
+            success=True,
+            repo_url=repo_url,
+            full_name=repo,
+            branch=branch,
+            commit_sha=commit_sha,
+            files=len(request.files),
+            message=f"Repository created with {len(request.files)} files"
+        )
+        
+    except HTTPException as e:
+        if repo_url is None:
+            raise
+        error = e.detail
+    except Exception as e:
+        error = str(e)
+    
+    # Log failed usage
+    log_usage(
+        db=db,
+        user_id=user_id,
+        endpoint="/api/github/bootstrap",
+        cost=0,
+        success=False,
+        error_message=error
+    )
+    
+    if repo_url:
+        raise HTTPException(
+            status_code=502,
+            detail=f"Repository {repo_url} was created but the initial commit failed "
+                   f"(push the files with /api/github/push-files): {error}"
+        )
+    raise HTTPException(
+        status_code=500,
+        detail=f"Failed to bootstrap repository: {error}"
+    )
@@ -1,11 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func, or_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, Field
 from typing import Optional, List
+from enum import Enum
+from datetime import datetime, timedelta, timezone
+import asyncio
+import base64
+import threading
 import praw
+from praw.models import MoreComments
 
 from app.auth import get_current_user
-from app.database import get_db, log_usage
+from app.cache import TTLCache
+from app.database import (
+    get_db, log_usage, SessionLocal,
+    RedditWatch, RedditWatchSubscription, RedditWatchMatch
+)
 from app.config import get_settings
 
 router = APIRouter(prefix="/api/reddit", tags=["Reddit"])
@@ -33,6 +45,7 @@ class RedditSearchRequest(BaseModel):
 
 
 class RedditSearchResult(BaseModel):
+    id: str
     title: str
     subreddit: str
     author: str
@@ -49,8 +62,128 @@ class RedditSearchResponse(BaseModel):
     results: List[RedditSearchResult]
 
 
+class RedditBatchQuery(BaseModel):
+    query: str = Field(..., min_length=1)
+    subreddit: Optional[str] = None
+
+
+class RedditBatchSearchRequest(BaseModel):
+    queries: List[RedditBatchQuery] = Field(..., min_length=1, max_length=20)
+    limit: int = Field(default=10, ge=1, le=100, description="Max results per query")
+
+
+class RedditBatchSearchResult(RedditSearchResult):
+    matched_queries: List[int]
+
+
+class RedditBatchQueryError(BaseModel):
+    index: int
+    error: str
+
+
+class RedditBatchSearchResponse(BaseModel):
+    success: bool
+    count: int
+    results: List[RedditBatchSearchResult]
+    errors: List[RedditBatchQueryError] = []
+
+
+class ListingSort(str, Enum):
+    hot = "hot"
+    new = "new"
+    top = "top"
+    rising = "rising"
+
+
+class TimeFilter(str, Enum):
+    hour = "hour"
+    day = "day"
+    week = "week"
+    month = "month"
+    year = "year"
+    all = "all"
+
+
+class RedditListingResponse(BaseModel):
+    success: bool
+    count: int
+    results: List[RedditSearchResult]
+    next_cursor: Optional[str] = None  # Older items (continue paging)
+    poll_cursor: Optional[str] = None  # Newer items (only for "new")
+    cached: bool = False
+
+
+class CommentSort(str, Enum):
+    confidence = "confidence"
+    top = "top"
+    new = "new"
+    controversial = "controversial"
+    old = "old"
+    qa = "qa"
+
+
+class RedditCommentTree(BaseModel):
+    """Comments as parallel arrays; parents[i] indexes into the same arrays (-1 = top-level)"""
+    ids: List[str] = []
+    parents: List[int] = []
+    authors: List[str] = []
+    scores: List[int] = []
+    created_utc: List[float] = []
+    bodies: List[str] = []
+
+
+class RedditCommentsResponse(BaseModel):
+    success: bool
+    post_id: str
+    count: int
+    truncated: bool
+    unexpanded: int  # "load more" stubs left unexpanded
+    comments: RedditCommentTree
+
+
+class RedditWatchRequest(BaseModel):
+    query: str = Field(..., min_length=1, max_length=512)
+    subreddit: Optional[str] = None
+
+
+class RedditWatchInfo(BaseModel):
+    watch_id: int
+    query: str
+    subreddit: str
+    last_polled_at: Optional[datetime] = None
+
+
+class RedditWatchResponse(BaseModel):
+    success: bool
+    watch_id: int
+    cursor: int
+    message: str
+
+
+class RedditWatchListResponse(BaseModel):
+    success: bool
+    watches: List[RedditWatchInfo]
+
+
+class RedditWatchMatchesResponse(BaseModel):
+    success: bool
+    watch_id: int
+    count: int
+    results: List[RedditSearchResult]
+    cursor: int  # Pass back to receive only newer matches
+
+
+# praw.Reddit is not thread-safe (its session, token refresh and rate-limit
+# state are shared), so each worker thread keeps its own client
+_reddit_local = threading.local()
+
+
 def get_reddit_client():
-    """Get configured Reddit client"""
+    """Get this thread's Reddit client, reused across requests"""
+    reddit = getattr(_reddit_local, "client", None)
+    if reddit is not None:
+        return reddit
+    
     if not all([
         settings.reddit_client_id,
         settings.reddit_client_secret,
@@ -62,13 +195,141 @@ def get_reddit_client():
             detail="Reddit API not configured on server"
         )
     
-    return praw.Reddit(
+    reddit = praw.Reddit(
         client_id=settings.reddit_client_id,
         client_secret=settings.reddit_client_secret,
         user_agent=settings.reddit_user_agent,
         username=settings.reddit_username,
         password=settings.reddit_password
     )
+    _reddit_local.client = reddit
+    return reddit
+
+
+def submission_to_result(submission) -> RedditSearchResult:
+    """Convert a praw submission into a search result"""
+    return RedditSearchResult(
+        id=submission.id,
+        title=submission.title,
+        subreddit=submission.subreddit.display_name,
+        author=str(submission.author),
+        score=submission.score,
+        url=f"https://reddit.com{submission.permalink}",
+        created_utc=submission.created_utc,
+        num_comments=submission.num_comments,
+        selftext=submission.selftext[:500]  # Truncate long text
+    )
+
+
+# Listing pages keyed by (subreddit, sort, time_filter, limit, cursor)
+listing_cache = TTLCache(ttl=settings.reddit_listing_cache_ttl, maxsize=2048)
+
+
+def encode_cursor(direction: str, fullname: str) -> str:
+    """Build an opaque cursor from a Reddit fullname"""
+    raw = f"{direction}:{fullname}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[str, str]:
+    """Parse a cursor into ("after" | "before", fullname)"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        direction, fullname = base64.urlsafe_b64decode(padded).decode("utf-8").split(":", 1)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if direction not in ("after", "before") or not fullname.startswith("t3_"):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return direction, fullname
+
+
+def fetch_listing(subreddit: str, sort: ListingSort, time_filter: TimeFilter,
+                  limit: int, params: dict) -> list:
+    """Fetch one listing page (call from a worker thread)"""
+    target = get_reddit_client().subreddit(subreddit)
+    if sort == ListingSort.top:
+        listing = target.top(time_filter=time_filter.value, limit=limit, params=params)
+    else:
+        listing = getattr(target, sort.value)(limit=limit, params=params)
+    return list(listing)
+
+
+class CommentCollector:
+    """Flattens praw comment forests into a RedditCommentTree within a budget"""
+    
+    def __init__(self, max_depth: int, max_comments: int):
+        self.max_depth = max_depth
+        self.max_comments = max_comments
+        self.tree = RedditCommentTree()
+        self.depths = []
+        self.index = {}  # comment id -> position in tree arrays
+    
+    @property
+    def full(self) -> bool:
+        return len(self.tree.ids) >= self.max_comments
+    
+    def add(self, items) -> list:
+        """
+        Add comments depth-first, parents before children
+        
+        Returns (depth, MoreComments) stubs found within the depth budget.
+        """
+        more = []
+        stack = list(reversed(list(items)))
+        while stack and not self.full:
+            item = stack.pop()
+            
+            parent_type, parent_id = item.parent_id.split("_", 1)
+            if parent_type == "t3":
+                parent, depth = -1, 0
+            else:
+                parent = self.index.get(parent_id)
+                if parent is None:
+                    continue  # Parent fell outside the budget
+                depth = self.depths[parent] + 1
+            if depth > self.max_depth:
+                continue
+            
+            if isinstance(item, MoreComments):
+                more.append((depth, item))
+                continue
+            if item.id in self.index:
+                continue
+            
+            self.index[item.id] = len(self.tree.ids)
+            self.depths.append(depth)
+            self.tree.ids.append(item.id)
+            self.tree.parents.append(parent)
+            self.tree.authors.append(str(item.author))
+            self.tree.scores.append(item.score)
+            self.tree.created_utc.append(item.created_utc)
+            self.tree.bodies.append(item.body)
+            
+            stack.extend(reversed(list(item.replies)))
+        return more
+
+
+def load_comments(post_id: str, sort: CommentSort) -> list:
+    """Fetch a submission's initial comment forest (call from a worker thread)"""
+    submission = get_reddit_client().submission(id=post_id)
+    submission.comment_sort = sort.value
+    return list(submission.comments)
+
+
+def expand_more(stub: MoreComments) -> list:
+    """Resolve one MoreComments stub (call from a worker thread)"""
+    # The stub belongs to the client that loaded it; use this thread's instead
+    stub._reddit = get_reddit_client()
+    return stub.comments(update=True)
+
+
+def run_search(query: str, subreddit: Optional[str], limit: int) -> List[RedditSearchResult]:
+    """Run a blocking Reddit search (call from a worker thread)"""
+    search_target = get_reddit_client().subreddit(subreddit or "all")
+    return [
+        submission_to_result(submission)
+        for submission in search_target.search(query, limit=limit)
+    ]
 
 
 @router.post("/post", response_model=RedditPostResponse)
@@ -141,27 +402,10 @@ async def search_reddit(
     Cost: $0.05 per search
     """
     try:
-        reddit = get_reddit_client()
+        get_reddit_client()  # Fail fast if not configured
         
-        # Search subreddit or all of Reddit
-        if subreddit:
-            search_target = reddit.subreddit(subreddit)
-        else:
-            search_target = reddit.subreddit("all")
-        
-        # Perform search
-        results = []
-        for submission in search_target.search(query, limit=limit):
-            results.append(RedditSearchResult(
-                title=submission.title,
-                subreddit=submission.subreddit.display_name,
-                author=str(submission.author),
-                score=submission.score,
-                url=f"https://reddit.com{submission.permalink}",
-                created_utc=submission.created_utc,
-                num_comments=submission.num_comments,
-                selftext=submission.selftext[:500]  # Truncate long text
-            ))
+        # Search subreddit or all of Reddit (praw blocks, keep it off the event loop)
+        results = await asyncio.to_thread(run_search, query, subreddit, limit)
         
         # Log successful usage
         log_usage(
@@ -193,3 +437,653 @@ async def search_reddit(
             status_code=500,
             detail=f"Failed to search Reddit: {str(e)}"
         )
+
+
+@router.post("/search/batch", response_model=RedditBatchSearchResponse)
+async def batch_search_reddit(
+    request: RedditBatchSearchRequest,
+    user_id: str = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Run several Reddit searches in one call
+    
+    Queries run concurrently (bounded by REDDIT_BATCH_CONCURRENCY).
+    Results are deduplicated by submission id across queries and ranked
+    by how many queries matched them, then by score.
+    Cost: $0.05 per successful query
+    """
+    try:
+        get_reddit_client()  # Fail fast if not configured
+        semaphore = asyncio.Semaphore(settings.reddit_batch_concurrency)
+        
+        async def run_one(item: RedditBatchQuery):
+            async with semaphore:
+                return await asyncio.to_thread(
+                    run_search, item.query, item.subreddit, request.limit
+                )
+        
+        outcomes = await asyncio.gather(
+            *(run_one(item) for item in request.queries),
+            return_exceptions=True
+        )
+        
+        # Merge and dedupe by submission id
+        merged = {}
+        errors = []
+        for index, outcome in enumerate(outcomes):
+            if isinstance(outcome, Exception):
+                errors.append(RedditBatchQueryError(index=index, error=str(outcome)))
+                continue
+            for result in outcome:
+                if result.id in merged:
+                    merged[result.id].matched_queries.append(index)
+                else:
+                    merged[result.id] = RedditBatchSearchResult(
+                        **result.model_dump(),
+                        matched_queries=[index]
+                    )
+        
+        succeeded = len(request.queries) - len(errors)
+        if succeeded == 0:
+            raise Exception(errors[0].error)
+        
+        results = sorted(
+            merged.values(),
+            key=lambda r: (len(r.matched_queries), r.score),
+            reverse=True
+        )
+        
+        # Log successful usage once for the whole batch
+        log_usage(
+            db=db,
+            user_id=user_id,
+            endpoint="/api/reddit/search/batch",
+            cost=settings.cost_reddit_search * succeeded,
+            success=True
+        )
+        
+        return RedditBatchSearchResponse(
+            success=True,
+            count=len(results),
+            results=results,
+            errors=errors
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        # Log failed usage
+        log_usage(
+            db=db,
+            user_id=user_id,
+            endpoint="/api/reddit/search/batch",
+            cost=0,  # Don't charge for failures
+            success=False,
+            error_message=str(e)
+        )
+        
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to search Reddit: {str(e)}"
+        )
+
+
+@router.get("/r/{subreddit}/{sort}", response_model=RedditListingResponse)
+async def get_subreddit_listing(
+    subreddit: str,
+    sort: ListingSort,
+    limit: int = Query(default=25, ge=1, le=100),
+    cursor: Optional[str] = None,
+    time_filter: TimeFilter = TimeFilter.day,
+    user_id: str = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    List subreddit posts (hot, new, top or rising) one page at a time
+    
+    Pass `next_cursor` back as `cursor` to continue into older posts.
+    For `new`, pass `poll_cursor` to fetch only posts submitted since the
+    previous call. Pages are cached briefly per cursor.
+    Cost: $0.02 per page
+    """
+    try:
+        params = {}
+        if cursor:
+            direction, fullname = decode_cursor(cursor)
+            params[direction] = fullname
+        
+        cache_key = (subreddit.lower(), sort.value, time_filter.value, limit, cursor)
+        page = listing_cache.get(cache_key)
+        cached = page is not None
+        
+        if page is None:
+            get_reddit_client()  # Fail fast if not configured
+            submissions = await asyncio.to_thread(
+                fetch_listing, subreddit, sort, time_filter, limit, params
+            )
+            results = [submission_to_result(s) for s in submissions]
+            
+            next_cursor = None
+            if submissions and len(submissions) == limit and "before" not in params:
+                next_cursor = encode_cursor("after", submissions[-1].fullname)
+            
+            poll_cursor = None
+            if sort == ListingSort.new:
+                if submissions:
+                    poll_cursor = encode_cursor("before", submissions[0].fullname)
+                elif "before" in params:
+                    poll_cursor = cursor  # Nothing new yet, keep polling from here
+            
+            page = (results, next_cursor, poll_cursor)
+            listing_cache.set(cache_key, page)
+        
+        results, next_cursor, poll_cursor = page
+        
+        # Log successful usage
+        log_usage(
+            db=db,
+            user_id=user_id,
+            endpoint="/api/reddit/listing",
+            cost=settings.cost_reddit_listing,
+            success=True
+        )
+        
+        return RedditListingResponse(
+            success=True,
+            count=len(results),
+            results=results,
+            next_cursor=next_cursor,
+            poll_cursor=poll_cursor,
+            cached=cached
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        # Log failed usage
+        log_usage(
+            db=db,
+            user_id=user_id,
+            endpoint="/api/reddit/listing",
+            cost=0,  # Don't charge for failures
+            success=False,
+            error_message=str(e)
+        )
+        
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to fetch Reddit listing: {str(e)}"
+        )
+
+
+@router.get("/post/{post_id}/comments", response_model=RedditCommentsResponse)
+async def get_post_comments(
+    post_id: str,
+    sort: CommentSort = CommentSort.confidence,
+    max_depth: int = Query(default=5, ge=0, le=10),
+    max_comments: int = Query(default=500, ge=1, le=5000),
+    more_limit: int = Query(default=32, ge=0, le=200, description="Max 'load more' expansions"),
+    user_id: str = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Fetch a post's comment tree as compact parent-indexed arrays
+    
+    "Load more" stubs are expanded concurrently (bounded by
+    REDDIT_MORE_CONCURRENCY), shallowest first, until the depth, comment
+    or expansion budget runs out.
+    Cost: $0.05 per request
+    """
+    try:
+        get_reddit_client()  # Fail fast if not configured
+        collector = CommentCollector(max_depth, max_comments)
+        
+        top_level = await asyncio.to_thread(load_comments, post_id, sort)
+        pending = collector.add(top_level)
+        
+        semaphore = asyncio.Semaphore(settings.reddit_more_concurrency)
+        
+        async def expand(stub: MoreComments):
+            async with semaphore:
+                return await asyncio.to_thread(expand_more, stub)
+        
+        expansions = 0
+        while pending and expansions < more_limit and not collector.full:
+            # Shallow stubs with the most hidden comments first
+            pending.sort(key=lambda p: (p[0], -(p[1].count or 0)))
+            batch = pending[:more_limit - expansions]
+            pending = pending[len(batch):]
+            expansions += len(batch)
+            
+            outcomes = await asyncio.gather(
+                *(expand(stub) for _, stub in batch),
+                return_exceptions=True
+            )
+            for outcome in outcomes:
+                if not isinstance(outcome, Exception):
+                    pending.extend(collector.add(outcome))
+        
+        # Log successful usage
+        log_usage(
+            db=db,
+            user_id=user_id,
+            endpoint="/api/reddit/post/comments",
+            cost=settings.cost_reddit_comments,
+            success=True
+        )
+        
+        return RedditCommentsResponse(
+            success=True,
+            post_id=post_id,
+            count=len(collector.tree.ids),
+            truncated=collector.full or bool(pending),
+            unexpanded=len(pending),
+            comments=collector.tree
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        # Log failed usage
+        log_usage(
+            db=db,
+            user_id=user_id,
+            endpoint="/api/reddit/post/comments",
+            cost=0,  # Don't charge for failures
+            success=False,
+            error_message=str(e)
+        )
+        
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to fetch Reddit comments: {str(e)}"
+        )
+
+
+# Watch scheduler
+# One upstream search per unique (query, subreddit) per interval, no matter
+# how many users subscribe. Workers claim a watch by bumping last_polled_at,
+# so multi-worker deployments still poll each watch once.
+
+WATCH_TICK_SECONDS = 10
+
+_watch_task = None
+
+
+def search_newest(query: str, subreddit: str, limit: int) -> list:
+    """Fetch the newest submissions matching a query (call from a worker thread)"""
+    return list(get_reddit_client().subreddit(subreddit).search(query, sort="new", limit=limit))
+
+
+def record_watch_matches(db: Session, watch_id: int, watch_created: float,
+                         watermark: Optional[float], submissions: list):
+    """
+    Store submissions not yet matched and advance the watch's watermark
+    
+    Reddit search indexes posts with a lag, so a post can show up after a
+    newer one was already seen. Anything created since the watch was set up
+    and no older than the watermark minus a grace window is a candidate;
+    posts already stored are skipped by id.
+    """
+    if not submissions:
+        return
+    
+    since = watch_created
+    if watermark is not None:
+        since = max(since, watermark - settings.reddit_watch_index_grace_seconds)
+    candidates = [s for s in submissions if s.created_utc > since]
+    known = {
+        row.submission_id for row in db.query(RedditWatchMatch.submission_id).filter(
+            RedditWatchMatch.watch_id == watch_id,
+            RedditWatchMatch.submission_id.in_([s.id for s in candidates])
+        )
+    } if candidates else set()
+    
+    # Oldest first so match ids (cursors) follow post order
+    for submission in sorted(candidates, key=lambda s: s.created_utc):
+        if submission.id in known:
+            continue
+        result = submission_to_result(submission)
+        db.add(RedditWatchMatch(
+            watch_id=watch_id,
+            submission_id=result.id,
+            title=result.title,
+            subreddit=result.subreddit,
+            author=result.author,
+            score=result.score,
+            url=result.url,
+            created_utc=result.created_utc,
+            num_comments=result.num_comments,
+            selftext=result.selftext
+        ))
+    
+    newest = max(s.created_utc for s in submissions)
+    if watermark is None or newest > watermark:
+        db.query(RedditWatch).filter(RedditWatch.id == watch_id).update(
+            {"newest_created_utc": newest},
+            synchronize_session=False
+        )
+
+
+async def poll_due_watches():
+    """Poll every subscribed watch whose interval has elapsed"""
+    get_reddit_client()  # Raises if Reddit isn't configured
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        cutoff = now - timedelta(seconds=settings.reddit_watch_interval)
+        
+        due = db.query(RedditWatch).filter(
+            RedditWatch.id.in_(db.query(RedditWatchSubscription.watch_id)),
+            or_(RedditWatch.last_polled_at.is_(None), RedditWatch.last_polled_at < cutoff)
+        ).all()
+        
+        # Claim each watch; another worker that got there first wins
+        claimed = []
+        for watch in due:
+            updated = db.query(RedditWatch).filter(
+                RedditWatch.id == watch.id,
+                RedditWatch.last_polled_at == watch.last_polled_at
+            ).update({"last_polled_at": now}, synchronize_session=False)
+            db.commit()
+            if updated:
+                claimed.append((watch.id, watch.query, watch.subreddit, watch.created_at,
+                                watch.newest_created_utc))
+        
+        semaphore = asyncio.Semaphore(settings.reddit_batch_concurrency)
+        
+        async def fetch(query: str, subreddit: str):
+            async with semaphore:
+                return await asyncio.to_thread(
+                    search_newest, query, subreddit, settings.reddit_watch_fetch_limit
+                )
+        
+        outcomes = await asyncio.gather(
+            *(fetch(query, subreddit) for _, query, subreddit, _, _ in claimed),
+            return_exceptions=True
+        )
+        
+        for (watch_id, _, _, created_at, watermark), outcome in zip(claimed, outcomes):
+            if isinstance(outcome, Exception):
+                print(f"❌ Reddit watch {watch_id} poll failed: {outcome}")
+                continue
+            watch_created = created_at.replace(tzinfo=timezone.utc).timestamp()
+            record_watch_matches(db, watch_id, watch_created, watermark, outcome)
+            db.commit()
+        
+        # Drop matches past retention
+        retention_cutoff = now - timedelta(hours=settings.reddit_watch_retention_hours)
+        db.query(RedditWatchMatch).filter(
+            RedditWatchMatch.found_at < retention_cutoff
+        ).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+async def run_watch_scheduler():
+    """Background loop polling due watches"""
+    while True:
+        try:
+            await poll_due_watches()
+        except HTTPException:
+            pass  # Reddit not configured on server
+        except Exception as e:
+            print(f"❌ Reddit watch scheduler error: {e}")
+        await asyncio.sleep(WATCH_TICK_SECONDS)
+
+
+def start_watch_scheduler():
+    """Start the watch scheduler (called from app lifespan)"""
+    global _watch_task
+    if _watch_task is None:
+        _watch_task = asyncio.create_task(run_watch_scheduler())
+
+
+async def stop_watch_scheduler():
+    """Stop the watch scheduler (called from app lifespan)"""
+    global _watch_task
+    if _watch_task is not None:
+        _watch_task.cancel()
+        try:
+            await _watch_task
+        except asyncio.CancelledError:
+            pass
+        _watch_task = None
+
+
+def latest_match_id(db: Session, watch_id: int) -> int:
+    """Highest match id stored for a watch (0 if none)"""
+    return db.query(func.max(RedditWatchMatch.id)).filter(
+        RedditWatchMatch.watch_id == watch_id
+    ).scalar() or 0
+
+
+def find_watch(db: Session, query: str, subreddit: str) -> Optional[RedditWatch]:
+    return db.query(RedditWatch).filter(
+        RedditWatch.query == query,
+        RedditWatch.subreddit == subreddit
+    ).first()
+
+
+def get_subscribed_watch(db: Session, user_id: str, watch_id: int) -> RedditWatch:
+    """Get a watch the user is subscribed to"""
+    subscription = db.query(RedditWatchSubscription).filter(
+        RedditWatchSubscription.user_id == user_id,
+        RedditWatchSubscription.watch_id == watch_id
+    ).first()
+    watch = db.query(RedditWatch).filter(RedditWatch.id == watch_id).first() if subscription else None
+    if not watch:
+        raise HTTPException(status_code=404, detail="Watch not found")
+    return watch
+
+
+@router.post("/watches", response_model=RedditWatchResponse)
+async def create_watch(
+    request: RedditWatchRequest,
+    user_id: str = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Watch a search query for new posts
+    
+    The server polls Reddit once per interval for each unique
+    (query, subreddit), shared across all subscribers. Use the returned
+    cursor with /watches/{watch_id}/matches to receive only new posts.
+    Cost: $0.05 per watch created
+    """
+    try:
+        query = request.query.strip()
+        subreddit = (request.subreddit or "all").strip().lower()
+        
+        watch_count = db.query(RedditWatchSubscription).filter(
+            RedditWatchSubscription.user_id == user_id
+        ).count()
+        if watch_count >= settings.reddit_watch_max_per_user:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Watch limit reached ({settings.reddit_watch_max_per_user})"
+            )
+        
+        watch = find_watch(db, query, subreddit)
+        if not watch:
+            try:
+                watch = RedditWatch(query=query, subreddit=subreddit)
+                db.add(watch)
+                db.commit()
+                db.refresh(watch)
+            except IntegrityError:
+                # A concurrent request created it first; share that one
+                db.rollback()
+                watch = find_watch(db, query, subreddit)
+        
+        subscribed = db.query(RedditWatchSubscription).filter(
+            RedditWatchSubscription.user_id == user_id,
+            RedditWatchSubscription.watch_id == watch.id
+        ).first()
+        if not subscribed:
+            try:
+                db.add(RedditWatchSubscription(user_id=user_id, watch_id=watch.id))
+                db.commit()
+            except IntegrityError:
+                db.rollback()
+                subscribed = True
+        
+        # Log successful usage
+        log_usage(
+            db=db,
+            user_id=user_id,
+            endpoint="/api/reddit/watches",
+            cost=settings.cost_reddit_watch_create,
+            success=True
+        )
+        
+        return RedditWatchResponse(
+            success=True,
+            watch_id=watch.id,
+            cursor=latest_match_id(db, watch.id),
+            message="Watch created" if not subscribed else "Already watching"
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        # Log failed usage
+        log_usage(
+            db=db,
+            user_id=user_id,
+            endpoint="/api/reddit/watches",
+            cost=0,  # Don't charge for failures
+            success=False,
+            error_message=str(e)
+        )
+        
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to create watch: {str(e)}"
+        )
+
+
+@router.get("/watches", response_model=RedditWatchListResponse)
+async def list_watches(
+    user_id: str = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    List your watches
+    
+    This endpoint is free.
+    """
+    watches = db.query(RedditWatch).join(
+        RedditWatchSubscription,
+        RedditWatchSubscription.watch_id == RedditWatch.id
+    ).filter(RedditWatchSubscription.user_id == user_id).all()
+    
+    return RedditWatchListResponse(
+        success=True,
+        watches=[
+            RedditWatchInfo(
+                watch_id=w.id,
+                query=w.query,
+                subreddit=w.subreddit,
+                last_polled_at=w.last_polled_at
+            )
+            for w in watches
+        ]
+    )
+
+
+@router.delete("/watches/{watch_id}")
+async def delete_watch(
+    watch_id: int,
+    user_id: str = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Stop watching
+    
+    The shared watch stops polling once it has no subscribers.
+    This endpoint is free.
+    """
+    get_subscribed_watch(db, user_id, watch_id)
+    db.query(RedditWatchSubscription).filter(
+        RedditWatchSubscription.user_id == user_id,
+        RedditWatchSubscription.watch_id == watch_id
+    ).delete(synchronize_session=False)
+    db.commit()
+    
+    return {"success": True, "message": "Watch removed"}
+
+
+@router.get("/watches/{watch_id}/matches", response_model=RedditWatchMatchesResponse)
+async def get_watch_matches(
+    watch_id: int,
+    cursor: int = Query(default=0, ge=0),
+    limit: int = Query(default=50, ge=1, le=200),
+    user_id: str = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Get posts found by a watch since `cursor`
+    
+    Served from the local match table; no Reddit call is made.
+    Cost: $0.01 per request
+    """
+    try:
+        get_subscribed_watch(db, user_id, watch_id)
+        
+        matches = db.query(RedditWatchMatch).filter(
+            RedditWatchMatch.watch_id == watch_id,
+            RedditWatchMatch.id > cursor
+        ).order_by(RedditWatchMatch.id).limit(limit).all()
+        
+        results = [
+            RedditSearchResult(
+                id=m.submission_id,
+                title=m.title,
+                subreddit=m.subreddit,
+                author=m.author,
+                score=m.score,
+                url=m.url,
+                created_utc=m.created_utc,
+                num_comments=m.num_comments,
+                selftext=m.selftext
+            )
+            for m in matches
+        ]
+        
+        # Log successful usage
+        log_usage(
+            db=db,
+            user_id=user_id,
+            endpoint="/api/reddit/watches/matches",
+            cost=settings.cost_reddit_watch_poll,
+            success=True
+        )
+        
+        return RedditWatchMatchesResponse(
+            success=True,
+            watch_id=watch_id,
+            count=len(results),
+            results=results,
+            cursor=matches[-1].id if matches else cursor
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        # Log failed usage
+        log_usage(
+            db=db,
+            user_id=user_id,
+            endpoint="/api/reddit/watches/matches",
+            cost=0,  # Don't charge for failures
+            success=False,
+            error_message=str(e)
+        )
+        
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to get watch matches: {str(e)}"
+        )
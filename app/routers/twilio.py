@@ -7,13 +7,11 @@ import base64
 from app.auth import get_current_user
 from app.database import get_db, log_usage
 from app.config import get_settings
+from app.vault import get_credential, set_credential, delete_credential
 
 router = APIRouter(prefix="/api/twilio", tags=["Twilio"])
 settings = get_settings()
 
-# In-memory credential storage (TODO: move to encrypted DB for production)
-user_credentials = {}
-
 
 # Request/Response Models
 class SetCredentialsRequest(BaseModel):
@@ -53,7 +51,7 @@ class MakeCallResponse(BaseModel):
 
 def get_user_credentials(user_id: str) -> tuple[str, str, str]:
     """Get stored Twilio credentials for user"""
-    creds = user_credentials.get(user_id)
+    creds = get_credential(user_id, "twilio")
     if not creds:
         raise HTTPException(
             status_code=401,
@@ -94,12 +92,12 @@ async def set_twilio_credentials(
                 detail="Invalid Twilio credentials. Please check and try again."
             )
     
-    # Store credentials (TODO: encrypt in production)
-    user_credentials[user_id] = {
+    # Store credentials (encrypted, visible to all workers)
+    set_credential(user_id, "twilio", {
         "account_sid": request.account_sid,
         "auth_token": request.auth_token,
         "from_phone": request.from_phone
-    }
+    })
     
     return SetCredentialsResponse(
         success=True,
@@ -107,6 +105,21 @@ async def set_twilio_credentials(
     )
 
 
+@router.delete("/credentials")
+async def delete_twilio_credentials(
+    user_id: str = Depends(get_current_user),
+):
+    """
+    Remove your stored Twilio credentials
+    
+    This endpoint is free.
+    """
+    if not delete_credential(user_id, "twilio"):
+        raise HTTPException(status_code=404, detail="No Twilio credentials stored")
+    
+    return {"success": True, "message": "Twilio credentials removed"}
+
+
 @router.post("/sms/send", response_model=SendSMSResponse)
 async def send_sms(
     request: SendSMSRequest,
@@ -1,11 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Optional, List, Annotated
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+import asyncio
+import functools
+import io
+import time
+import requests
 import tweepy
 
 from app.auth import get_current_user
-from app.database import get_db, log_usage
+from app.cache import TTLCache
+from app.database import get_db, log_usage, log_usage_batch
 from app.config import get_settings
 
 router = APIRouter(prefix="/api/twitter", tags=["Twitter"])
@@ -16,6 +24,7 @@ settings = get_settings()
 class TweetRequest(BaseModel):
     text: str = Field(..., min_length=1, max_length=280)
     reply_to_tweet_id: Optional[str] = None
+    media_ids: Optional[List[str]] = Field(default=None, max_length=4, description="From /api/twitter/media")
 
 
 class TweetResponse(BaseModel):
@@ -25,8 +34,214 @@ class TweetResponse(BaseModel):
     tweet_url: Optional[str] = None
 
 
+class TweetThreadRequest(BaseModel):
+    texts: List[Annotated[str, Field(min_length=1, max_length=280)]] = Field(..., min_length=1, max_length=25)
+    reply_to_tweet_id: Optional[str] = None
+    start_index: int = Field(default=0, ge=0, description="Resume a failed thread from this text")
+
+
+class ThreadTweet(BaseModel):
+    index: int
+    tweet_id: str
+    tweet_url: str
+
+
+class TweetThreadResponse(BaseModel):
+    success: bool
+    message: str
+    tweets: List[ThreadTweet]
+    thread_url: Optional[str] = None
+
+
+class TweetItem(BaseModel):
+    id: str
+    text: str
+    author_id: Optional[str] = None
+    created_at: Optional[str] = None
+    conversation_id: Optional[str] = None
+
+
+class TweetListResponse(BaseModel):
+    success: bool
+    count: int
+    tweets: List[TweetItem]
+    newest_id: Optional[str] = None  # Pass as since_id to fetch only newer tweets
+    next_token: Optional[str] = None  # Pass as pagination_token for the next page
+    cached: bool = False
+
+
+class MediaCategory(str, Enum):
+    tweet_image = "tweet_image"
+    tweet_gif = "tweet_gif"
+    tweet_video = "tweet_video"
+
+
+class MediaUploadResponse(BaseModel):
+    success: bool
+    message: str
+    media_id: str
+    size: int
+    processing_state: Optional[str] = None
+
+
+class RateLimitStatus(BaseModel):
+    limit: Optional[int] = None
+    remaining: Optional[int] = None
+    reset: Optional[int] = None  # Unix timestamp
+
+
+class RateLimitsResponse(BaseModel):
+    success: bool
+    endpoints: dict[str, RateLimitStatus]
+
+
+# Long-lived clients (their requests.Session pools connections);
+# v1.1 API is only used for media upload
+_twitter_client = None
+_twitter_api = None
+
+# Dedicated executor so blocking tweepy calls never run on the event loop,
+# with a cap on queued calls so a Twitter slowdown can't pile up unbounded
+_twitter_executor = ThreadPoolExecutor(
+    max_workers=settings.twitter_max_workers,
+    thread_name_prefix="twitter"
+)
+_twitter_slots = asyncio.Semaphore(settings.twitter_max_pending)
+
+# Read results keyed by endpoint + parameters, and username -> user id
+read_cache = TTLCache(ttl=settings.twitter_read_cache_ttl, maxsize=1024)
+user_id_cache = TTLCache(ttl=24 * 3600, maxsize=4096)
+
+TWEET_FIELDS = ["author_id", "created_at", "conversation_id"]
+
+# Latest x-rate-limit-* headers seen per endpoint
+rate_limits: dict[str, RateLimitStatus] = {}
+
+
+def record_rate_limit(endpoint: str, headers):
+    """Remember rate-limit headers from a Twitter response"""
+    if not headers or "x-rate-limit-remaining" not in headers:
+        return
+    rate_limits[endpoint] = RateLimitStatus(
+        limit=int(headers.get("x-rate-limit-limit", 0)),
+        remaining=int(headers["x-rate-limit-remaining"]),
+        reset=int(headers.get("x-rate-limit-reset", 0))
+    )
+
+
+def check_rate_limit(endpoint: str):
+    """Fail fast when an endpoint's window is known to be exhausted"""
+    status = rate_limits.get(endpoint)
+    if status and status.remaining == 0 and status.reset:
+        retry_after = status.reset - int(time.time())
+        if retry_after > 0:
+            raise HTTPException(
+                status_code=429,
+                detail=f"Twitter rate limit reached for {endpoint}, resets in {retry_after}s",
+                headers={"Retry-After": str(retry_after)}
+            )
+
+
+async def call_twitter(endpoint: str, func, *args, **kwargs) -> requests.Response:
+    """
+    Run a blocking tweepy call on the Twitter executor
+    
+    Rate-limit headers are recorded from every response (including errors).
+    """
+    check_rate_limit(endpoint)
+    if _twitter_slots.locked():
+        raise HTTPException(
+            status_code=503,
+            detail="Twitter request queue is full, try again shortly"
+        )
+    
+    async with _twitter_slots:
+        loop = asyncio.get_running_loop()
+        try:
+            response = await loop.run_in_executor(
+                _twitter_executor,
+                functools.partial(func, *args, **kwargs)
+            )
+        except tweepy.HTTPException as e:
+            record_rate_limit(endpoint, e.response.headers)
+            raise
+    
+    record_rate_limit(endpoint, getattr(response, "headers", None))
+    return response
+
+
+def tweet_url(tweet_id: str) -> str:
+    return f"https://twitter.com/user/status/{tweet_id}"
+
+
+async def create_tweet(client, text: str, reply_to_tweet_id: Optional[str] = None,
+                       media_ids: Optional[List[str]] = None) -> str:
+    """Post a single tweet and return its id"""
+    kwargs = {"text": text}
+    if reply_to_tweet_id:
+        kwargs["in_reply_to_tweet_id"] = reply_to_tweet_id
+    if media_ids:
+        kwargs["media_ids"] = media_ids
+    
+    response = await call_twitter("POST /2/tweets", client.create_tweet, **kwargs)
+    return response.json()["data"]["id"]
+
+
+def parse_tweet_list(data: dict, since_id: Optional[str] = None) -> dict:
+    """
+    Turn a v2 tweet list response into TweetListResponse fields
+    
+    A since_id poll with no new tweets has no meta.newest_id; the caller's
+    since_id is handed back so their cursor isn't lost.
+    """
+    meta = data.get("meta", {})
+    tweets = [TweetItem(**{k: t.get(k) for k in TweetItem.model_fields}) for t in data.get("data", [])]
+    return {
+        "count": len(tweets),
+        "tweets": tweets,
+        "newest_id": meta.get("newest_id") or since_id,
+        "next_token": meta.get("next_token")
+    }
+
+
+async def cached_read(cache_key: tuple, endpoint: str, func, **kwargs) -> tuple[dict, bool]:
+    """Fetch a tweet list through the read cache; returns (fields, cached)"""
+    page = read_cache.get(cache_key)
+    if page is not None:
+        return page, True
+    
+    response = await call_twitter(endpoint, func, **kwargs)
+    page = parse_tweet_list(response.json(), since_id=kwargs.get("since_id"))
+    read_cache.set(cache_key, page)
+    return page, False
+
+
+async def lookup_user_id(client, username: str) -> str:
+    """Resolve a username to a user id (cached)"""
+    key = username.lower()
+    twitter_user_id = user_id_cache.get(key)
+    if twitter_user_id is None:
+        response = await call_twitter(
+            "GET /2/users/by/username/:username",
+            client.get_user,
+            username=username,
+            user_auth=True
+        )
+        data = response.json().get("data")
+        if not data:
+            raise HTTPException(status_code=404, detail=f"Twitter user not found: {username}")
+        twitter_user_id = data["id"]
+        user_id_cache.set(key, twitter_user_id)
+    return twitter_user_id
+
+
 def get_twitter_client():
-    """Get configured Twitter API v2 client"""
+    """Get configured Twitter API v2 client, reused across requests"""
+    global _twitter_client
+    
+    if _twitter_client is not None:
+        return _twitter_client
+    
     if not all([
         settings.twitter_consumer_key,
         settings.twitter_consumer_secret,
@@ -39,13 +254,15 @@ def get_twitter_client():
         )
     
     try:
-        client = tweepy.Client(
+        # Raw responses so rate-limit headers are available
+        _twitter_client = tweepy.Client(
             consumer_key=settings.twitter_consumer_key,
             consumer_secret=settings.twitter_consumer_secret,
             access_token=settings.twitter_access_token,
-            access_token_secret=settings.twitter_access_token_secret
+            access_token_secret=settings.twitter_access_token_secret,
+            return_type=requests.Response
         )
-        return client
+        return _twitter_client
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -53,6 +270,22 @@ def get_twitter_client():
         )
 
 
+def get_twitter_api():
+    """Get configured Twitter API v1.1 client (media upload), reused across requests"""
+    global _twitter_api
+    
+    if _twitter_api is None:
+        get_twitter_client()  # Same credential check
+        auth = tweepy.OAuth1UserHandler(
+            settings.twitter_consumer_key,
+            settings.twitter_consumer_secret,
+            settings.twitter_access_token,
+            settings.twitter_access_token_secret
+        )
+        _twitter_api = tweepy.API(auth)
+    return _twitter_api
+
+
 @router.post("/tweet", response_model=TweetResponse)
 async def post_tweet(
     request: TweetRequest,
@@ -68,19 +301,15 @@ async def post_tweet(
     Parameters:
     - text: Tweet content (1-280 characters)
     - reply_to_tweet_id: Optional tweet ID to reply to
+    - media_ids: Optional media IDs from /api/twitter/media (up to 4)
     """
     try:
         client = get_twitter_client()
         
         # Post tweet
-        kwargs = {"text": request.text}
-        if request.reply_to_tweet_id:
-            kwargs["in_reply_to_tweet_id"] = request.reply_to_tweet_id
-        
-        response = client.create_tweet(**kwargs)
-        
-        tweet_id = response.data["id"]
-        tweet_url = f"https://twitter.com/user/status/{tweet_id}"
+        tweet_id = await create_tweet(
+            client, request.text, request.reply_to_tweet_id, request.media_ids
+        )
         
         # Log successful usage
         log_usage(
@@ -95,9 +324,30 @@ async def post_tweet(
             success=True,
             message="Tweet posted successfully",
             tweet_id=tweet_id,
-            tweet_url=tweet_url
+            tweet_url=tweet_url(tweet_id)
         )
         
+    except HTTPException:
+        raise
+    
+    except tweepy.TooManyRequests as e:
+        log_usage(
+            db=db,
+            user_id=user_id,
+            endpoint="/api/twitter/tweet",
+            cost=0,
+            success=False,
+            error_message=str(e)
+        )
+        
+        reset = e.response.headers.get("x-rate-limit-reset")
+        retry_after = max(int(reset) - int(time.time()), 1) if reset else 60
+        raise HTTPException(
+            status_code=429,
+            detail=f"Twitter rate limit exceeded: {str(e)}",
+            headers={"Retry-After": str(retry_after)}
+        )
+    
     except tweepy.TweepyException as e:
         # Log failed usage
         log_usage(
@@ -129,3 +379,390 @@ async def post_tweet(
             status_code=500,
             detail=f"Failed to post tweet: {str(e)}"
         )
+
+
+async def upload_segments(api, media_id: str, request: Request, total_bytes: int) -> int:
+    """
+    Stream the request body to Twitter as APPEND segments
+    
+    At most TWITTER_MEDIA_PARALLEL_SEGMENTS segments are in flight, so
+    memory per upload stays around (parallel + 1) x segment size.
+    Returns the number of bytes received.
+    """
+    segment_size = settings.twitter_media_segment_bytes
+    slots = asyncio.Semaphore(settings.twitter_media_parallel_segments)
+    tasks = []
+    
+    async def append(index: int, chunk: bytes):
+        try:
+            await call_twitter(
+                "POST /1.1/media/upload",
+                api.chunked_upload_append,
+                media_id,
+                io.BytesIO(chunk),
+                index
+            )
+        finally:
+            slots.release()
+    
+    async def submit(chunk: bytes):
+        await slots.acquire()
+        for task in tasks:
+            if task.done() and task.exception():
+                slots.release()
+                raise task.exception()
+        tasks.append(asyncio.create_task(append(len(tasks), chunk)))
+    
+    buffer = bytearray()
+    received = 0
+    try:
+        async for piece in request.stream():
+            received += len(piece)
+            if received > total_bytes:
+                raise HTTPException(status_code=400, detail="Body longer than Content-Length")
+            buffer += piece
+            while len(buffer) >= segment_size:
+                chunk = bytes(buffer[:segment_size])
+                del buffer[:segment_size]
+                await submit(chunk)
+        if buffer:
+            await submit(bytes(buffer))
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+    
+    return received
+
+
+async def wait_for_processing(api, media) -> Optional[str]:
+    """Poll STATUS until async (video/GIF) processing finishes"""
+    info = getattr(media, "processing_info", None)
+    deadline = time.monotonic() + settings.twitter_media_processing_timeout
+    while info and info.get("state") in ("pending", "in_progress"):
+        if time.monotonic() >= deadline:
+            break
+        await asyncio.sleep(info.get("check_after_secs", 1))
+        media = await call_twitter(
+            "GET /1.1/media/upload",
+            api.get_media_upload_status,
+            media.media_id_string
+        )
+        info = getattr(media, "processing_info", None)
+    
+    if info and info.get("state") == "failed":
+        raise Exception(f"Media processing failed: {info.get('error', {}).get('message', 'unknown error')}")
+    return info.get("state") if info else None
+
+
+@router.post("/media", response_model=MediaUploadResponse)
+async def upload_media(
+    request: Request,
+    media_type: str = Query(..., description="MIME type, e.g. image/png or video/mp4"),
+    media_category: Optional[MediaCategory] = None,
+    user_id: str = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Upload an image or video for use in a tweet
+    
+    Send the raw file as the request body with a Content-Length header.
+    The body is streamed to Twitter's chunked INIT/APPEND/FINALIZE upload
+    in segments (appended in parallel) and is never held in memory whole.
+    Pass the returned media_id in `media_ids` on /api/twitter/tweet.
+    
+    Cost: $0.05 per upload
+    """
+    content_length = request.headers.get("content-length")
+    if not content_length:
+        raise HTTPException(status_code=411, detail="Content-Length header required")
+    try:
+        total_bytes = int(content_length)
+    except ValueError:
+        total_bytes = -1
+    if total_bytes < 0:
+        raise HTTPException(status_code=400, detail="Invalid Content-Length header")
+    if total_bytes == 0:
+        raise HTTPException(status_code=400, detail="Empty upload")
+    if total_bytes > settings.twitter_media_max_bytes:
+        raise HTTPException(status_code=413, detail="Media file too large")
+    
+    try:
+        api = get_twitter_api()
+        
+        media = await call_twitter(
+            "POST /1.1/media/upload",
+            api.chunked_upload_init,
+            total_bytes,
+            media_type,
+            media_category=media_category.value if media_category else None
+        )
+        media_id = media.media_id_string
+        
+        received = await upload_segments(api, media_id, request, total_bytes)
+        if received != total_bytes:
+            raise HTTPException(status_code=400, detail="Body shorter than Content-Length")
+        
+        media = await call_twitter(
+            "POST /1.1/media/upload",
+            api.chunked_upload_finalize,
+            media_id
+        )
+        processing_state = await wait_for_processing(api, media)
+        
+        # Log successful usage
+        log_usage(
+            db=db,
+            user_id=user_id,
+            endpoint="/api/twitter/media",
+            cost=settings.cost_twitter_media,
+            success=True
+        )
+        
+        return MediaUploadResponse(
+            success=True,
+            message="Media uploaded successfully",
+            media_id=media_id,
+            size=total_bytes,
+            processing_state=processing_state
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        # Log failed usage
+        log_usage(
+            db=db,
+            user_id=user_id,
+            endpoint="/api/twitter/media",
+            cost=0,  # Don't charge for failures
+            success=False,
+            error_message=str(e)
+        )
+        
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to upload media: {str(e)}"
+        )
+
+
+@router.post("/thread", response_model=TweetThreadResponse)
+async def post_thread(
+    request: TweetThreadRequest,
+    user_id: str = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Post a thread of tweets in one call
+    
+    Each tweet replies to the previous one. If posting fails partway, the
+    error detail lists the tweets already posted and a `resume` object;
+    send the same texts again with those `start_index` and
+    `reply_to_tweet_id` values to continue from the last posted tweet.
+    
+    Cost: $0.10 per tweet posted
+    """
+    if request.start_index >= len(request.texts):
+        raise HTTPException(status_code=400, detail="start_index is past the end of texts")
+    
+    client = get_twitter_client()
+    
+    posted = []
+    reply_to = request.reply_to_tweet_id
+    error = None
+    for index in range(request.start_index, len(request.texts)):
+        try:
+            tweet_id = await create_tweet(client, request.texts[index], reply_to)
+        except Exception as e:
+            error = e
+            break
+        posted.append(ThreadTweet(index=index, tweet_id=tweet_id, tweet_url=tweet_url(tweet_id)))
+        reply_to = tweet_id
+    
+    # Log usage for the whole thread in one batch
+    entries = [
+        {
+            "user_id": user_id,
+            "endpoint": "/api/twitter/thread",
+            "cost": settings.cost_twitter_tweet,
+            "success": True
+        }
+        for _ in posted
+    ]
+    if error is not None:
+        entries.append({
+            "user_id": user_id,
+            "endpoint": "/api/twitter/thread",
+            "cost": 0,  # Don't charge for failures
+            "success": False,
+            "error_message": str(getattr(error, "detail", error))
+        })
+    log_usage_batch(db, entries)
+    
+    if error is not None:
+        status_code = 500
+        headers = None
+        if isinstance(error, HTTPException):
+            status_code, headers = error.status_code, error.headers
+        elif isinstance(error, tweepy.TooManyRequests):
+            status_code = 429
+        
+        raise HTTPException(
+            status_code=status_code,
+            detail={
+                "error": f"Failed to post thread: {getattr(error, 'detail', error)}",
+                "posted": [t.model_dump() for t in posted],
+                "resume": {
+                    "start_index": request.start_index + len(posted),
+                    "reply_to_tweet_id": reply_to
+                }
+            },
+            headers=headers
+        )
+    
+    return TweetThreadResponse(
+        success=True,
+        message=f"Thread of {len(posted)} tweets posted successfully",
+        tweets=posted,
+        thread_url=posted[0].tweet_url
+    )
+
+
+async def read_tweets(db: Session, user_id: str, endpoint: str, fetch) -> TweetListResponse:
+    """Run a read endpoint with the usual usage logging and error mapping"""
+    try:
+        page, cached = await fetch()
+        
+        # Log successful usage
+        log_usage(
+            db=db,
+            user_id=user_id,
+            endpoint=endpoint,
+            cost=settings.cost_twitter_read,
+            success=True
+        )
+        
+        return TweetListResponse(success=True, cached=cached, **page)
+    
+    except HTTPException:
+        raise
+    
+    except tweepy.TooManyRequests as e:
+        log_usage(
+            db=db,
+            user_id=user_id,
+            endpoint=endpoint,
+            cost=0,
+            success=False,
+            error_message=str(e)
+        )
+        
+        reset = e.response.headers.get("x-rate-limit-reset")
+        retry_after = max(int(reset) - int(time.time()), 1) if reset else 60
+        raise HTTPException(
+            status_code=429,
+            detail=f"Twitter rate limit exceeded: {str(e)}",
+            headers={"Retry-After": str(retry_after)}
+        )
+    
+    except Exception as e:
+        # Log failed usage
+        log_usage(
+            db=db,
+            user_id=user_id,
+            endpoint=endpoint,
+            cost=0,  # Don't charge for failures
+            success=False,
+            error_message=str(e)
+        )
+        
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to read tweets: {str(e)}"
+        )
+
+
+@router.get("/search/recent", response_model=TweetListResponse)
+async def search_recent_tweets(
+    query: str = Query(..., min_length=1, max_length=512),
+    max_results: int = Query(default=10, ge=10, le=100),
+    since_id: Optional[str] = None,
+    pagination_token: Optional[str] = None,
+    user_id: str = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Search tweets from the last 7 days
+    
+    Pass the returned `newest_id` as `since_id` on the next poll to get
+    only new tweets, or `next_token` as `pagination_token` to page back.
+    Identical requests are served from a short-lived cache.
+    
+    Cost: $0.02 per request
+    """
+    client = get_twitter_client()
+    
+    async def fetch():
+        return await cached_read(
+            ("search", query, max_results, since_id, pagination_token),
+            "GET /2/tweets/search/recent",
+            client.search_recent_tweets,
+            query=query,
+            max_results=max_results,
+            since_id=since_id,
+            next_token=pagination_token,
+            tweet_fields=TWEET_FIELDS,
+            user_auth=True
+        )
+    
+    return await read_tweets(db, user_id, "/api/twitter/search/recent", fetch)
+
+
+@router.get("/users/{username}/tweets", response_model=TweetListResponse)
+async def get_user_timeline(
+    username: str,
+    max_results: int = Query(default=10, ge=5, le=100),
+    since_id: Optional[str] = None,
+    pagination_token: Optional[str] = None,
+    user_id: str = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Get a user's recent tweets
+    
+    Supports `since_id` incremental sync and `pagination_token` paging,
+    like /search/recent. Identical requests are served from a
+    short-lived cache.
+    
+    Cost: $0.02 per request
+    """
+    client = get_twitter_client()
+    
+    async def fetch():
+        twitter_user_id = await lookup_user_id(client, username)
+        return await cached_read(
+            ("timeline", twitter_user_id, max_results, since_id, pagination_token),
+            "GET /2/users/:id/tweets",
+            client.get_users_tweets,
+            id=twitter_user_id,
+            max_results=max_results,
+            since_id=since_id,
+            pagination_token=pagination_token,
+            tweet_fields=TWEET_FIELDS,
+            user_auth=True
+        )
+    
+    return await read_tweets(db, user_id, "/api/twitter/users/tweets", fetch)
+
+
+@router.get("/rate-limits", response_model=RateLimitsResponse)
+async def get_rate_limits(
+    user_id: str = Depends(get_current_user),
+):
+    """
+    Show the latest Twitter rate-limit status seen per endpoint
+    
+    This endpoint is free.
+    """
+    return RateLimitsResponse(success=True, endpoints=rate_limits)
@@ -7,13 +7,11 @@ import secrets
 from app.auth import get_current_user
 from app.database import get_db, log_usage
 from app.config import get_settings
+from app.vault import get_credential, set_credential, delete_credential
 
 router = APIRouter(prefix="/api/vercel", tags=["Vercel"])
 settings = get_settings()
 
-# In-memory token storage (TODO: move to encrypted DB for production)
-user_tokens = {}
-
 
 # Request/Response Models
 class SetTokenRequest(BaseModel):
@@ -57,13 +55,13 @@ class DeploymentStatusResponse(BaseModel):
 
 def get_user_token(user_id: str) -> str:
     """Get stored Vercel token for user"""
-    token = user_tokens.get(user_id)
-    if not token:
+    credential = get_credential(user_id, "vercel")
+    if not credential:
         raise HTTPException(
             status_code=401,
             detail="Vercel token not set. Call /api/vercel/set-token first."
         )
-    return token
+    return credential["token"]
 
 
 @router.post("/set-token", response_model=SetTokenResponse)
@@ -91,8 +89,8 @@ async def set_vercel_token(
                 detail="Invalid Vercel token. Please check and try again."
             )
     
-    # Store token (TODO: encrypt in production)
-    user_tokens[user_id] = request.vercel_token
+    # Store token (encrypted, visible to all workers)
+    set_credential(user_id, "vercel", {"token": request.vercel_token})
     
     return SetTokenResponse(
         success=True,
@@ -100,6 +98,21 @@ async def set_vercel_token(
     )
 
 
+@router.delete("/token")
+async def delete_vercel_token(
+    user_id: str = Depends(get_current_user),
+):
+    """
+    Remove your stored Vercel token
+    
+    This endpoint is free.
+    """
+    if not delete_credential(user_id, "vercel"):
+        raise HTTPException(status_code=404, detail="No Vercel token stored")
+    
+    return {"success": True, "message": "Vercel token removed"}
+
+
 @router.get("/projects", response_model=ProjectListResponse)
 async def list_projects(
     user_id: str = Depends(get_current_user),
@@ -0,0 +1,152 @@
+"""
+Helpers for streaming file content into outbound JSON request bodies.
+
+APIs like SendGrid and GitHub want binary content base64-encoded inside a
+JSON document. Building that document in memory holds the file several
+times over (raw, base64, JSON). These helpers encode incrementally so a
+request body can be generated chunk by chunk with a known length.
+"""
+import base64
+import json
+import tempfile
+from typing import AsyncIterator, Callable, Tuple
+
+from fastapi import UploadFile
+from starlette.datastructures import Headers
+from starlette.formparsers import MultiPartException, MultiPartParser
+
+# Multiple of 3 so every full chunk encodes without padding
+CHUNK_SIZE = 3 * 64 * 1024
+
+
+def base64_length(size: int) -> int:
+    """Length of the base64 encoding of `size` bytes"""
+    return 4 * ((size + 2) // 3)
+
+
+class Base64Encoder:
+    """Incremental base64 encoder for arbitrarily sized chunks"""
+
+    def __init__(self):
+        self._pending = b""
+
+    def update(self, data: bytes) -> bytes:
+        data = self._pending + data
+        cut = len(data) - len(data) % 3
+        self._pending = data[cut:]
+        return base64.b64encode(data[:cut])
+
+    def finish(self) -> bytes:
+        encoded = base64.b64encode(self._pending)
+        self._pending = b""
+        return encoded
+
+
+async def iter_base64(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Base64-encode an async stream of byte chunks"""
+    encoder = Base64Encoder()
+    async for chunk in chunks:
+        encoded = encoder.update(chunk)
+        if encoded:
+            yield encoded
+    tail = encoder.finish()
+    if tail:
+        yield tail
+
+
+async def iter_upload_file(upload, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """Read a FastAPI UploadFile in chunks from the start"""
+    await upload.seek(0)
+    while True:
+        chunk = await upload.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+def json_fragment(value) -> bytes:
+    """JSON-encode a value for splicing into a streamed document"""
+    return json.dumps(value).encode("utf-8")
+
+
+async def spool_body(chunks: AsyncIterator[bytes], max_bytes: int,
+                     memory_bytes: int = 1024 * 1024) -> UploadFile:
+    """
+    Copy a request body stream into a temp file (in memory while small)
+
+    Raises ValueError once more than `max_bytes` arrive. The result can be
+    read back any number of times, e.g. to retry an outbound request.
+    """
+    upload = UploadFile(file=tempfile.SpooledTemporaryFile(max_size=memory_bytes))
+    size = 0
+    async for chunk in chunks:
+        size += len(chunk)
+        if size > max_bytes:
+            await upload.close()
+            raise ValueError(f"Body exceeds {max_bytes} bytes")
+        await upload.write(chunk)
+    upload.size = size
+    return upload
+
+
+def base64_json_body(fields: dict, key: str, upload: UploadFile,
+                     size: int) -> Tuple[Callable[[], AsyncIterator[bytes]], int]:
+    """
+    Stream `fields` as a JSON object with the upload base64-encoded under `key`
+
+    Returns a factory for the body chunks (call it again to resend) and
+    the exact body length.
+    """
+    head = json_fragment(fields)[:-1] + (b',' if fields else b'') + json_fragment(key) + b':"'
+    tail = b'"}'
+
+    async def body() -> AsyncIterator[bytes]:
+        yield head
+        async for chunk in iter_base64(iter_upload_file(upload)):
+            yield chunk
+        yield tail
+
+    return body, len(head) + base64_length(size) + len(tail)
+
+
+class PartTooLarge(MultiPartException):
+    """A multipart part (or all files together) went over its size limit"""
+
+
+class LimitedMultiPartParser(MultiPartParser):
+    """
+    Starlette's multipart parser with size limits enforced while streaming
+
+    Plain form parsing spools the whole body to disk before the endpoint
+    can look at it. This parser raises PartTooLarge as soon as a file,
+    a text field or the files' total exceed their limits, so an oversized
+    upload never takes more than its limit in memory or temp space.
+    """
+
+    def __init__(self, headers: Headers, stream: AsyncIterator[bytes], *,
+                 max_file_bytes: int, max_total_file_bytes: int,
+                 max_field_bytes: int = 1024 * 1024, **kwargs):
+        super().__init__(headers, stream, **kwargs)
+        self.max_file_bytes = max_file_bytes
+        self.max_total_file_bytes = max_total_file_bytes
+        self.max_field_bytes = max_field_bytes
+        self._part_bytes = 0
+        self._total_file_bytes = 0
+
+    def on_part_begin(self) -> None:
+        super().on_part_begin()
+        self._part_bytes = 0
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        self._part_bytes += end - start
+        upload = self._current_part.file
+        if upload is None:
+            if self._part_bytes > self.max_field_bytes:
+                raise PartTooLarge(f"Field too large: {self._current_part.field_name}")
+        else:
+            self._total_file_bytes += end - start
+            if self._part_bytes > self.max_file_bytes:
+                raise PartTooLarge(f"Attachment too large: {upload.filename}")
+            if self._total_file_bytes > self.max_total_file_bytes:
+                raise PartTooLarge("Attachments exceed the per-message size limit")
+        super().on_part_data(data, start, end)
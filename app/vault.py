@@ -0,0 +1,162 @@
+"""
+Encrypted credential storage shared by all workers.
+
+Third-party credentials (GitHub/Vercel tokens, Twilio account secrets)
+are stored Fernet-encrypted in the credentials table. Each process keeps
+decrypted values in a small LRU. Every few seconds a worker asks the
+database which credentials changed since its last check (an index scan
+on updated_at) and drops those entries, so updates made through another
+worker are picked up.
+"""
+import json
+import time
+from datetime import datetime, timedelta
+from threading import Lock
+from typing import Optional
+
+from cryptography.fernet import Fernet, InvalidToken
+from fastapi import HTTPException
+
+from app.cache import TTLCache
+from app.config import get_settings
+from app.database import SessionLocal, Credential
+
+settings = get_settings()
+
+# Allowance for clock skew between workers when polling for changes
+SYNC_OVERLAP = timedelta(seconds=30)
+
+_cache = TTLCache(maxsize=settings.credential_cache_size)
+_sync_lock = Lock()
+_last_sync = 0.0
+_synced_until: Optional[datetime] = None
+_fernet: Optional[Fernet] = None
+
+
+KEY_HELP = (
+    "Set CREDENTIAL_ENCRYPTION_KEY to a Fernet key, e.g. the output of: "
+    "python -c \"from cryptography.fernet import Fernet; print(Fernet.generate_key().decode())\""
+)
+
+
+def load_fernet() -> Fernet:
+    """Build the cipher from settings; raises RuntimeError if the key is missing or malformed"""
+    if not settings.credential_encryption_key:
+        raise RuntimeError(f"CREDENTIAL_ENCRYPTION_KEY is not set. {KEY_HELP}")
+    try:
+        return Fernet(settings.credential_encryption_key.encode())
+    except ValueError:
+        raise RuntimeError(f"CREDENTIAL_ENCRYPTION_KEY is not a valid Fernet key. {KEY_HELP}")
+
+
+def init_vault():
+    """Check the encryption key at startup, so a bad deployment fails fast (called from app lifespan)"""
+    global _fernet
+    _fernet = load_fernet()
+
+
+def get_fernet() -> Fernet:
+    global _fernet
+    
+    if _fernet is None:
+        try:
+            _fernet = load_fernet()
+        except RuntimeError as e:
+            raise HTTPException(status_code=503, detail=f"Credential storage not configured on server: {e}")
+    return _fernet
+
+
+def sync_cache():
+    """Evict cached credentials that changed in the database since the last check"""
+    global _last_sync, _synced_until
+    
+    with _sync_lock:
+        if time.monotonic() - _last_sync < settings.credential_cache_sync_seconds:
+            return
+        _last_sync = time.monotonic()
+        since, _synced_until = _synced_until, datetime.utcnow()
+    
+    if since is None:
+        return  # Nothing cached before the first check
+    
+    db = SessionLocal()
+    try:
+        changed = db.query(Credential.user_id, Credential.provider).filter(
+            Credential.updated_at > since - SYNC_OVERLAP
+        ).all()
+    finally:
+        db.close()
+    for row in changed:
+        _cache.pop((row.user_id, row.provider))
+
+
+def get_credential(user_id: str, provider: str) -> Optional[dict]:
+    """Decrypted credential for a user, or None if not stored"""
+    fernet = get_fernet()
+    sync_cache()
+    key = (user_id, provider)
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached or None  # {} caches "not stored"
+    
+    db = SessionLocal()
+    try:
+        row = db.query(Credential).filter(
+            Credential.user_id == user_id,
+            Credential.provider == provider
+        ).first()
+    finally:
+        db.close()
+    
+    value = {}
+    if row is not None and row.secret:
+        try:
+            value = json.loads(fernet.decrypt(row.secret.encode()))
+        except InvalidToken:
+            raise HTTPException(
+                status_code=500,
+                detail="Stored credential could not be decrypted (encryption key changed?)"
+            )
+    
+    _cache.set(key, value)
+    return value or None
+
+
+def set_credential(user_id: str, provider: str, value: dict):
+    """Store (or replace) a user's credential"""
+    secret = get_fernet().encrypt(json.dumps(value).encode()).decode()
+    _write(user_id, provider, secret)
+    _cache.set((user_id, provider), dict(value))
+
+
+def delete_credential(user_id: str, provider: str) -> bool:
+    """
+    Forget a user's credential; returns False if none was stored
+    
+    The row is kept as a tombstone so other workers notice the change.
+    """
+    existed = _write(user_id, provider, None)
+    _cache.set((user_id, provider), {})
+    return existed
+
+
+def _write(user_id: str, provider: str, secret: Optional[str]) -> bool:
+    """Upsert a credential row; returns whether it held a secret before"""
+    db = SessionLocal()
+    try:
+        row = db.query(Credential).filter(
+            Credential.user_id == user_id,
+            Credential.provider == provider
+        ).first()
+        if row is None:
+            if secret is None:
+                return False
+            row = Credential(user_id=user_id, provider=provider)
+            db.add(row)
+        existed = row.secret is not None
+        row.secret = secret
+        row.updated_at = datetime.utcnow()
+        db.commit()
+        return existed
+    finally:
+        db.close()
@@ -0,0 +1,201 @@
+"""
+Offline tests for email backend failover and health tracking
+
+Run with: python -m pytest tests
+(the SMTP tests need aiosmtpd: pip install aiosmtpd)
+"""
+import asyncio
+import socket
+
+import httpx
+import pytest
+
+from app import http_clients
+from app.routers import email
+from app.routers.email import (
+    EmailBackend, EmailBackendRouter, EmailRejected, SendGridBackend, SMTPBackend
+)
+
+
+class FakeClock:
+    """Stands in for the time module so cool-downs can be skipped"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+class StubBackend(EmailBackend):
+    """Backend whose outcome is set by the test"""
+
+    def __init__(self, name: str):
+        super().__init__()
+        self.name = name
+        self.error = None
+        self.sent = []
+
+    def configured(self) -> bool:
+        return True
+
+    async def send(self, to_email: str, subject: str, html_body: str) -> str:
+        if self.error:
+            raise self.error
+        self.sent.append(to_email)
+        return f"{self.name}-{len(self.sent)}"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(email, "time", clock)
+    return clock
+
+
+def send(router: EmailBackendRouter, to_email: str = "ada@example.com"):
+    return asyncio.run(router.send(to_email, "Subject", "<p>Body</p>"))
+
+
+def test_fails_over_and_recovers_after_cooldown(clock):
+    primary, fallback = StubBackend("primary"), StubBackend("fallback")
+    router = EmailBackendRouter([primary, fallback])
+
+    assert send(router) == ("primary", "primary-1")
+
+    # Primary errors: each send still succeeds through the fallback
+    primary.error = ConnectionError("connection refused")
+    assert send(router) == ("fallback", "fallback-1")
+    assert send(router) == ("fallback", "fallback-2")
+    assert not primary.health.available()
+
+    # While its circuit is open, the primary isn't tried first
+    primary.error = None
+    assert send(router) == ("fallback", "fallback-3")
+    assert primary.sent == ["ada@example.com"]
+
+    # After the cool-down a good trial send resets its stats
+    clock.now += email.settings.email_backend_cooldown_seconds
+    assert send(router) == ("primary", "primary-2")
+    assert primary.health.available()
+    assert primary.health.error_rate == 0.0
+
+
+def test_rejected_email_does_not_fail_over(clock):
+    primary, fallback = StubBackend("primary"), StubBackend("fallback")
+    router = EmailBackendRouter([primary, fallback])
+    primary.error = EmailRejected("invalid recipient")
+
+    for _ in range(3):
+        with pytest.raises(EmailRejected):
+            send(router)
+
+    assert fallback.sent == []
+    assert primary.health.available()
+    assert primary.health.error_rate == 0.0
+
+
+def test_all_backends_failing_raises(clock):
+    primary, fallback = StubBackend("primary"), StubBackend("fallback")
+    primary.error = TimeoutError()
+    fallback.error = ConnectionError("relay down")
+
+    with pytest.raises(Exception, match="primary: TimeoutError; fallback: relay down"):
+        send(EmailBackendRouter([primary, fallback]))
+
+
+class RecordingHandler:
+    """aiosmtpd handler keeping delivered messages; refuses listed recipients"""
+
+    def __init__(self, refuse=()):
+        self.refuse = set(refuse)
+        self.messages = []
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address in self.refuse:
+            return "550 No such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return "250 Message accepted for delivery"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server(monkeypatch):
+    """Local SMTP stand-in that requires login, with settings pointed at it"""
+    controller_module = pytest.importorskip("aiosmtpd.controller")
+    from aiosmtpd.smtp import AuthResult
+
+    def authenticate(server, session, envelope, mechanism, auth_data):
+        return AuthResult(success=(auth_data.login, auth_data.password) == (b"relay", b"secret"))
+
+    handler = RecordingHandler(refuse={"nobody@example.com"})
+    port = free_port()
+    controller = controller_module.Controller(
+        handler, hostname="127.0.0.1", port=port,
+        authenticator=authenticate, auth_required=True, auth_require_tls=False
+    )
+    controller.start()
+
+    monkeypatch.setattr(email.settings, "smtp_host", "127.0.0.1")
+    monkeypatch.setattr(email.settings, "smtp_port", port)
+    monkeypatch.setattr(email.settings, "smtp_use_tls", False)
+    monkeypatch.setattr(email.settings, "smtp_username", "relay")
+    monkeypatch.setattr(email.settings, "smtp_password", "secret")
+    monkeypatch.setattr(email.settings, "smtp_from_email", "relay@example.com")
+    yield handler
+    controller.stop()
+
+
+@pytest.fixture
+def sendgrid_down(monkeypatch):
+    """SendGrid configured, but every mail/send answers 503"""
+    calls = []
+
+    def respond(request):
+        calls.append(request)
+        return httpx.Response(503, text="Service Unavailable")
+
+    monkeypatch.setattr(email.settings, "sendgrid_api_key", "SG.test")
+    monkeypatch.setattr(email.settings, "sendgrid_from_email", "sender@example.com")
+    monkeypatch.setitem(
+        http_clients._clients, "sendgrid",
+        httpx.AsyncClient(base_url="https://api.sendgrid.com", transport=httpx.MockTransport(respond))
+    )
+    return calls
+
+
+def test_sendgrid_failure_fails_over_to_smtp(smtp_server, sendgrid_down):
+    router = EmailBackendRouter([SendGridBackend(), SMTPBackend()])
+
+    provider, message_id = send(router)
+
+    assert provider == "smtp"
+    assert len(sendgrid_down) == 1
+    assert router.backends[0].health.error_rate > 0
+
+    [envelope] = smtp_server.messages
+    assert envelope.mail_from == "relay@example.com"
+    assert envelope.rcpt_tos == ["ada@example.com"]
+    content = envelope.content.decode()
+    assert "Subject: Subject" in content
+    assert "<p>Body</p>" in content
+    assert f"Message-ID: <{message_id}>" in content
+
+
+def test_smtp_refused_recipient_is_rejected(smtp_server, sendgrid_down):
+    router = EmailBackendRouter([SMTPBackend()])
+
+    with pytest.raises(EmailRejected):
+        send(router, "nobody@example.com")
+
+    assert smtp_server.messages == []
+    assert router.backends[0].health.error_rate == 0.0